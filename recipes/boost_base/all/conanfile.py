@@ -1,12 +1,24 @@
 from conans import ConanFile, tools, load
 from conans.util.files import save
 from conans.model.conan_file import create_options
+from conans.model import Generator
 import os
 import json
 import glob
+import hashlib
+import shutil
+import tarfile
+import tempfile
+import fasteners
 import locale
+import pickle
+import re
 import subprocess
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 
 
 boost_conan_mixins = []
@@ -81,7 +93,12 @@ class BoostBaseConan(ConanFile):
 
     @property
     def no_copy_source(self):
-        return self.is_base
+        '''
+        The base, and the header only packages, don't build anything from the
+        sources. So they are packaged straight from the source folder instead
+        of copying the sources to the build folder.
+        '''
+        return self.is_base or self.is_header_only_package
 
     #
     # Information on this base class, irrespective of the instance class.
@@ -116,6 +133,8 @@ class BoostBaseConan(ConanFile):
             self._boost_data_ = {
                 "test_package_conan": {
                     "b2_requires": [],
+                    "b2_requires_closure": [],
+                    "bundled_headers": [],
                     "cycle_group": None,
                     "header_only_libs": ["test_package_conan"],
                     "lib_short_names": ["test_package_conan"],
@@ -124,12 +143,51 @@ class BoostBaseConan(ConanFile):
                 }
             }
         if not hasattr(self, '_boost_data_'):
+            self._boost_data_ = self.boost_package_data(self.version)
+
+    # The package data of each version. Shared, read only, by all the package
+    # instances in the process.
+    _boost_data_store = {}
+
+    def boost_package_data(self, version):
+        '''
+        The data for all the packages of the given Boost `version`. It's
+        loaded once and shared by all the packages. Optionally, with
+        `CONAN_BOOST_DATA_PICKLE=1`, from a pickled copy of the JSON in the
+        machine wide cache.
+        '''
+        if version not in self._boost_data_store:
             json_file = os.path.join(
                 self.base_source_path,
                 'src', 'data',
-                'package-data-boost-{0}.json'.format(self.version))
-            with open(json_file, "r") as f:
-                self._boost_data_ = json.load(f)
+                'package-data-boost-{0}.json'.format(version))
+            data = None
+            if os.getenv('CONAN_BOOST_DATA_PICKLE', '0') == '1':
+                stat = os.stat(json_file)
+                pickle_file = boost_cache_dir('data', '%s-%s.pickle' % (
+                    os.path.basename(json_file)[:-5],
+                    hashlib.sha1(('%s:%s:%s' % (
+                        json_file, stat.st_mtime, stat.st_size)).encode(
+                            'utf-8')).hexdigest()[0:16]))
+                try:
+                    with open(pickle_file, 'rb') as f:
+                        data = pickle.load(f)
+                except Exception:
+                    data = None
+            if data is None:
+                with open(json_file, "r") as f:
+                    data = json.load(f)
+                if os.getenv('CONAN_BOOST_DATA_PICKLE', '0') == '1':
+                    tools.mkdir(os.path.dirname(pickle_file))
+                    with open(pickle_file + '.%s' % (os.getpid()), 'wb') as f:
+                        pickle.dump(data, f, 2)
+                    if os.path.exists(pickle_file):
+                        os.remove(pickle_file + '.%s' % (os.getpid()))
+                    else:
+                        os.rename(
+                            pickle_file + '.%s' % (os.getpid()), pickle_file)
+            self._boost_data_store[version] = boost_freeze(data)
+        return self._boost_data_store[version]
 
     #
     # Properties for the Boost package instance. These generally correspond
@@ -155,6 +213,15 @@ class BoostBaseConan(ConanFile):
         self.boost_init()
         return self._boost_data_[self.boost_name]['b2_requires']
 
+    @property
+    def boost_requires_closure(self):
+        '''
+        All the other Boost libraries we depend on, directly or indirectly.
+        The `boost_requires` only has the ones not implied by the others.
+        '''
+        self.boost_init()
+        return self._boost_data_[self.boost_name]['b2_requires_closure']
+
     @property
     def boost_build_requires(self):
         '''
@@ -170,7 +237,7 @@ class BoostBaseConan(ConanFile):
         '''
         result = set()
         for mixin in self.boost_mixins:
-            result.union(set(mixin.boost_build_defines))
+            result.update(mixin.boost_build_defines)
         return list(sorted(result))
 
     @property
@@ -193,6 +260,16 @@ class BoostBaseConan(ConanFile):
         self.boost_init()
         return self._boost_data_[self.boost_name]['cycle_group']
 
+    @property
+    def boost_cycle_group_package(self):
+        '''
+        The name of the package of our cycle group, i.e. "boost_<group>", to
+        refer to it in the options and dependency info. Otherwise "None".
+        '''
+        if not self.boost_cycle_group:
+            return None
+        return 'boost_' + self.boost_cycle_group
+
     @property
     def boost_libs(self):
         '''
@@ -228,6 +305,51 @@ class BoostBaseConan(ConanFile):
         self.boost_init()
         return self._boost_data_[self.boost_name]['source_only_deps']
 
+    @property
+    def boost_bundled_headers(self):
+        '''
+        Header only libraries that we package the headers of along with ours.
+        Those are in a header dependency cycle with us, and can't be required
+        without building the whole cycle together.
+        '''
+        self.boost_init()
+        return self._boost_data_[self.boost_name]['bundled_headers']
+
+    @property
+    def is_header_only_package(self):
+        '''
+        Returns true if all the libraries in the package are header only, and
+        it's not a library in a cycle group.
+        '''
+        return not self.boost_cycle_group and \
+            len(self.boost_libs_to_build) == 0
+
+    @property
+    def boost_build_members(self):
+        '''
+        The libraries to build. For a cycle group the ones selected with its
+        `build_members` option, otherwise all of them.
+        '''
+        if not self.is_cycle_group or 'build_members' not in self.options:
+            return self.boost_libs_to_build
+        value = str(self.options.build_members)
+        if value == 'all':
+            return self.boost_libs_to_build
+        members = set()
+        if value != 'needed':
+            members = set([m.strip() for m in value.split(',') if m.strip()])
+            unknown = members - set(self.boost_libs)
+            if unknown:
+                raise Exception(
+                    "Unknown build_members '%s', expected 'all', 'needed', "
+                    "or some of: %s." % (
+                        ", ".join(sorted(unknown)),
+                        ", ".join(sorted(self.boost_libs_to_build))))
+        for lib in self.boost_libs_to_build:
+            if self.options.get_safe('build_' + lib):
+                members.add(lib)
+        return [lib for lib in self.boost_libs_to_build if lib in members]
+
     @property
     def is_cycle_group(self):
         '''
@@ -261,45 +383,91 @@ class BoostBaseConan(ConanFile):
         if self.is_base:
             super(BoostBaseConan, self).initialize(settings, env)
         else:
-            # Save our initial unmodified properties.
-            base_options = BoostConanMixin(self, base_options=self)
+            options_key = (self.__class__, self.version)
+            base_options = self._boost_options_cache.get(options_key)
+            if not base_options:
+                # Save our initial unmodified properties.
+                base_options = BoostConanMixin(self, base_options=self)
             # The base can now muck with them.
             super(BoostBaseConan, self).initialize(settings, env)
             self.initialize_bare()
-            # We copy the options from the mixins and use that to reset our
-            # options.
-            for mixin in self.boost_mixins:
-                base_options.options.update(mixin.options)
-                base_options.default_options.update(
-                    mixin.default_options)
+            if options_key not in self._boost_options_cache:
+                # We copy the options from the mixins and use that to reset
+                # our options. The merged options are the same for all the
+                # instances of the package, so we only do that once.
+                for mixin in self.boost_mixins:
+                    base_options.options.update(mixin.options)
+                    base_options.default_options.update(
+                        mixin.default_options)
+                self._boost_options_cache[options_key] = base_options
             self.options = create_options(base_options)
 
+    # The options of each package class merged with those of its mixins.
+    _boost_options_cache = {}
+
     def initialize_bare(self):
         if not self.is_base:
             # Load up the Boost data for the mixins to interrogate.
             self.boost_init()
-            # We create all the mixins we know about and register the ones
-            # that are pretinent, i.e. match, our package.
-            self.boost_mixins = []
-            for mixin_class in boost_conan_mixins:
-                mixin = mixin_class(self)
-                if mixin.matches:
-                    self.boost_mixins.append(mixin)
+            # We create the mixins that are pretinent, i.e. match, our
+            # package.
+            self.boost_mixins = [
+                mixin_class(self) for mixin_class in self.boost_mixin_classes]
+
+    # The mixin classes that match each package, for each version of the
+    # shared package data.
+    _boost_mixin_index = {}
+
+    @property
+    def boost_mixin_classes(self):
+        '''
+        The mixin classes that match this package. Looked up in an index, of
+        all the packages, built once for each version of the package data.
+        '''
+        if self._boost_data_ is not self._boost_data_store.get(self.version):
+            # Not the shared package data, for example for a test package.
+            # Hence we match the mixins directly.
+            return [
+                mixin_class for mixin_class in boost_conan_mixins
+                if mixin_class(self).matches]
+        if self.version not in self._boost_mixin_index:
+            index = {}
+            for name in self._boost_data_.keys():
+                package = BoostPackageView(self._boost_data_, name)
+                index[name] = tuple([
+                    mixin_class for mixin_class in boost_conan_mixins
+                    if mixin_class(package).matches])
+            self._boost_mixin_index[self.version] = index
+        return self._boost_mixin_index[self.version][self.boost_name]
 
     def configure(self):
         '''
         Automatic configuration. Takes care to apply options specified in a
-        cycle group member to that cycle group.
+        cycle group member to that cycle group. Only the ones changed from
+        their defaults. So that a member left at the defaults doesn't undo
+        the options given to another member of the group.
         '''
         if self.is_base:
             return
         if self.boost_cycle_group:
-            class_options = getattr(self.__class__, 'options')
-            if class_options:
-                for option in getattr(self.__class__, 'options').keys():
-                    value = getattr(self.options, option)
-                    setattr(
-                        self.options[self.boost_cycle_group], option, value)
+            # The options of the class merged with the ones of the mixins.
+            # The group has the same mixins for our library.
+            package_options = self._boost_options_cache[
+                (self.__class__, self.version)]
+            for option in package_options.options.keys():
+                value = getattr(self.options, option)
+                if str(value) == str(
+                        package_options.default_options.get(option)):
+                    continue
+                setattr(
+                    self.options[self.boost_cycle_group_package],
+                    option, value)
+            # Ask the group to build our library. As it might only build the
+            # ones needed.
+            if not self.is_header_only(self.boost_libs[0]):
+                setattr(
+                    self.options[self.boost_cycle_group_package],
+                    'build_' + self.boost_libs[0], True)
 
     def config_options(self):
         '''
@@ -374,32 +542,255 @@ class BoostBaseConan(ConanFile):
         if self.is_base:
             return
         self.boost_init()
-        if not self.boost_cycle_group:
-            # It's a regular library, i.e. not a cycle group alias, set up the
-            # sources, including generated ones.
-            archive_name = "boost-" + self.version
-            # Download the source directly from GitHub library source.
-            libs_to_get = self.boost_libs + self.boost_source_only_deps
-            for lib in libs_to_get:
-                lib_repo = lib
-                if lib in self.boost_source_repo:
-                    lib_repo = self.boost_source_repo[lib]
-                tools.get(
-                    "{0}/{1}/archive/{2}.tar.gz".format(
-                        self.website, lib_repo, archive_name))
-                os.rename(lib_repo + "-" + archive_name, lib)
-            # If we are going to build something we need to get the matching
-            # boostcpp.jam build file from the Boost super-project.
-            if len(self.boost_libs_to_build) > 0:
-                bootcpp_raw_url = \
-                    "https://raw.githubusercontent.com/" + \
-                    "boostorg/boost/boost-{0}/boostcpp.jam"
-                tools.download(
-                    bootcpp_raw_url.format(self.version),
-                    "boostcpp.jam")
+        with self._boost_phase('source'):
+            if not self.boost_cycle_group:
+                # It's a regular library, i.e. not a cycle group alias, set up
+                # the sources, including generated ones.
+                libs_to_get = self.boost_libs + self.boost_source_only_deps + \
+                    self.boost_bundled_headers
+                self._source_github(libs_to_get)
 
+            for mixin in self.boost_mixins:
+                mixin.source()
+
+    def _source_github(self, libs_to_get):
+        '''
+        Downloads the given libraries from their individual GitHub
+        repositories.
+        '''
+        self._source_fetch_all(self.boost_github_fetches(
+            self.version, libs_to_get, len(self.boost_libs_to_build) > 0))
+
+    @classmethod
+    def boost_github_fetches(cls, version, libs, boostcpp_jam):
+        '''
+        The fetches, see `_source_fetch`, for the given libraries from their
+        individual GitHub repositories. And, when `boostcpp_jam` is true, of
+        the `boostcpp.jam` from the Boost super-project.
+        '''
+        archive_name = "boost-" + version
+        # Download the source directly from GitHub library source.
+        fetches = []
+        for lib in libs:
+            lib_repo = lib
+            if lib in cls.boost_source_repo:
+                lib_repo = cls.boost_source_repo[lib]
+            fetches.append({
+                'url': "{0}/{1}/archive/{2}.tar.gz".format(
+                    cls.website, lib_repo, archive_name),
+                'key': (lib_repo, archive_name, "archive.tar.gz"),
+                'filename': lib + "-" + archive_name + ".tar.gz",
+                'root': lib_repo + "-" + archive_name,
+                'destination': lib})
+        # If we are going to build something we need to get the matching
+        # boostcpp.jam build file from the Boost super-project.
+        if boostcpp_jam:
+            bootcpp_raw_url = \
+                "https://raw.githubusercontent.com/" + \
+                "boostorg/boost/boost-{0}/boostcpp.jam"
+            fetches.append({
+                'url': bootcpp_raw_url.format(version),
+                'key': ("boost", archive_name, "boostcpp.jam"),
+                'filename': "boostcpp.jam"})
+        return fetches
+
+    def _source_extract(self, filename, map_member):
+        '''
+        Extracts an archive in one streaming pass. Only the members for which
+        `map_member(name)` returns a path are extracted, to that path. Returns
+        the count, and size, of the extracted and skipped members. Fails on
+        members that would end up outside of the current dir, or that are not
+        files, dirs, or links.
+        '''
+        stats = {
+            'files': 0, 'bytes': 0, 'skipped_files': 0, 'skipped_bytes': 0}
+        root = os.path.realpath('.')
+
+        def check(path, name):
+            # The path, with any links already extracted, is in the root.
+            if os.path.isabs(path) or '..' in path.split('/') or \
+                    os.path.commonpath([root, os.path.realpath(
+                        os.path.join(root, path))]) != root:
+                raise Exception(
+                    "Unsafe path in archive %s: %s" % (filename, name))
+
+        # The checks of Python's own data filter, where it has one.
+        extract_args = {}
+        if hasattr(tarfile, 'data_filter'):
+            extract_args['filter'] = 'data'
+        with self._boost_phase('extract', **stats) as phase, \
+                tarfile.open(filename, 'r|*') as tar:
+            for member in tar:
+                name = member.name.replace('\\', '/')
+                path = map_member(name)
+                if not path:
+                    stats['skipped_files'] += 1
+                    stats['skipped_bytes'] += member.size
+                    continue
+                if not (member.isfile() or member.isdir() or
+                        member.issym() or member.islnk()):
+                    raise Exception(
+                        "Unsupported member in archive %s: %s" % (
+                            filename, name))
+                check(path, name)
+                if member.islnk():
+                    # Hard links refer to other members that we may have
+                    # relocated.
+                    member.linkname = map_member(
+                        member.linkname.replace('\\', '/'))
+                    if not member.linkname:
+                        stats['skipped_files'] += 1
+                        continue
+                    check(member.linkname, name)
+                elif member.issym():
+                    check(os.path.normpath(os.path.join(
+                        os.path.dirname(path), member.linkname)).replace(
+                            '\\', '/'), name)
+                member.name = path
+                tar.extract(member, **extract_args)
+                stats['files'] += 1
+                stats['bytes'] += member.size
+            phase.update(stats)
+        return stats
+
+    def _source_extract_report(self, stats):
+        self.output.info(
+            "Extracted %s files, %s bytes. Skipped %s files, %s bytes." % (
+                stats['files'], stats['bytes'],
+                stats['skipped_files'], stats['skipped_bytes']))
+
+    def boost_source_filter(self, lib):
+        '''
+        Returns a predicate that tells if a path, relative to the root of the
+        `lib` sources, needs extracting. Libraries we build skip only the
+        docs, tests, and examples. Everything else, i.e. header only libraries
+        and source only dependencies, need just the headers and licenses.
+        Mixins can add other directories with `boost_source_dirs`.
+        '''
+        extra_dirs = set()
         for mixin in self.boost_mixins:
-            mixin.source()
+            extra_dirs.update(mixin.boost_source_dirs.get(lib, []))
+        if lib in self.boost_libs_to_build:
+            skip_dirs = self.boost_source_skip_dirs - extra_dirs
+
+            def build_filter(path):
+                return path.split('/', 1)[0] not in skip_dirs
+            return build_filter
+        else:
+            keep_dirs = set(['include']) | extra_dirs
+
+            def headers_filter(path):
+                parts = path.split('/', 1)
+                if len(parts) == 1:
+                    return 'LICENSE' in parts[0]
+                return parts[0] in keep_dirs
+            return headers_filter
+
+    # Top level directories of library sources that we don't need for
+    # building.
+    boost_source_skip_dirs = set([
+        'bench', 'benchmark', 'doc', 'example', 'examples', 'test'])
+
+    def _source_fetch_all(self, fetches):
+        '''
+        Downloads, and extracts, all the given `fetches` concurrently. The
+        number of concurrent fetches is bounded by the
+        `CONAN_BOOST_SOURCE_JOBS` environment variable. Fails on the first
+        fetch that can't be completed even after retrying it.
+        '''
+        jobs = int(os.getenv('CONAN_BOOST_SOURCE_JOBS', '8'))
+        jobs = max(1, min(jobs, len(fetches)))
+        self.output.info("Fetching %s source files, %s at a time." % (
+            len(fetches), jobs))
+        stats = {
+            'files': 0, 'bytes': 0, 'skipped_files': 0, 'skipped_bytes': 0}
+        pool = ThreadPool(jobs)
+        try:
+            for fetch in pool.imap_unordered(self._source_fetch, fetches):
+                self.output.info("Fetched: %s" % (fetch['url']))
+                for key, value in fetch.get('stats', {}).items():
+                    stats[key] += value
+        finally:
+            pool.terminate()
+            pool.join()
+        self._source_extract_report(stats)
+
+    def _source_fetch(self, fetch):
+        '''
+        Downloads a single source file described by the `fetch` dictionary.
+        The download goes through the shared source cache, when enabled, to
+        avoid getting the same file more than once. When the fetch has a
+        `destination` the file is an archive that gets extracted and its `root`
+        directory renamed to the destination. Each fetch is retried,
+        `CONAN_BOOST_SOURCE_RETRY` times, as a whole.
+        '''
+        retry = int(os.getenv('CONAN_BOOST_SOURCE_RETRY', '2'))
+        retry_wait = int(os.getenv('CONAN_BOOST_SOURCE_RETRY_WAIT', '5'))
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self.boost_source_cache:
+                    filename = self.boost_source_cache.fetch(
+                        fetch['key'], fetch['url'], self._source_download)
+                else:
+                    filename = fetch['filename']
+                    self._source_download(fetch['url'], filename)
+                if 'destination' in fetch:
+                    lib_filter = self.boost_source_filter(
+                        fetch['destination'])
+
+                    def map_member(name):
+                        parts = name.split('/', 1)
+                        if parts[0] == fetch['root'] and len(parts) == 2 \
+                                and lib_filter(parts[1]):
+                            return fetch['destination'] + '/' + parts[1]
+                        return None
+                    fetch['stats'] = self._source_extract(
+                        filename, map_member)
+                    if not self.boost_source_cache:
+                        os.remove(filename)
+                elif self.boost_source_cache:
+                    shutil.copyfile(filename, fetch['filename'])
+                return fetch
+            except Exception as e:
+                # Clean up any partial results so that the retry starts
+                # from scratch. Including the cached file, as it might be the
+                # one that's bad.
+                if self.boost_source_cache:
+                    self.boost_source_cache.remove(fetch['key'])
+                for path in [fetch['filename'], fetch.get('destination')]:
+                    if path and os.path.isdir(path):
+                        tools.rmdir(path)
+                    elif path and os.path.isfile(path):
+                        os.remove(path)
+                if attempt > retry:
+                    raise
+                self.output.warn("Retrying fetch of %s, after error: %s" % (
+                    fetch['url'], e))
+                time.sleep(retry_wait)
+
+    def _source_download(self, url, filename):
+        with self._boost_phase('download', url=url) as phase:
+            tools.download(
+                url, filename, retry=0, retry_wait=0, overwrite=True)
+            phase['bytes'] = os.path.getsize(filename)
+
+    @property
+    def boost_source_cache(self):
+        '''
+        The machine wide cache of downloaded source files shared by all the
+        Boost packages. Is "None" when disabled with
+        `CONAN_BOOST_SOURCE_CACHE=0`.
+        '''
+        if not hasattr(self, '_boost_source_cache_'):
+            self._boost_source_cache_ = None
+            if os.getenv('CONAN_BOOST_SOURCE_CACHE', '1') != '0':
+                self._boost_source_cache_ = BoostSourceCache(
+                    boost_cache_dir('sources'),
+                    int(os.getenv('CONAN_BOOST_SOURCE_CACHE_SIZE', '4096'))
+                    * 1024 * 1024)
+        return self._boost_source_cache_
 
     def build(self):
         '''
@@ -421,17 +812,41 @@ class BoostBaseConan(ConanFile):
             return
 
         if len(self.boost_libs_to_build) > 0:
-            # Create local jamroot for build that defines magic rules,
-            # hooks, variables and targets to control the build for Conan.
-            self._write_jamroot_jam()
-            # Create local project-config.jam for setting up B2.
-            self._write_project_config_jam()
-            # Also write out the utility Windows short path script.
-            self._write_short_path_cmd()
-
-        # Build each library.
+            with self._boost_phase('jamroot'):
+                # Create local jamroot for build that defines magic rules,
+                # hooks, variables and targets to control the build for
+                # Conan.
+                self._write_jamroot_jam()
+                # Create local project-config.jam for setting up B2.
+                self._write_project_config_jam()
+                # Also write out the utility Windows short path script.
+                self._write_short_path_cmd()
+            # Reuse a previous build of the same configuration when asked.
+            if os.getenv('CONAN_BOOST_INCREMENTAL', '0') == '1':
+                self._setup_incremental_build()
+            # When asked, build all the variants, and libraries, together.
+            # Or get them from where another variant's package built them.
+            if self._b2_multi_variants:
+                self._build_multi_variant()
+            # When asked, and there is more than one library to build, build
+            # all of them with a single B2 invocation. Which lets B2 schedule
+            # all the compiles of the package together.
+            elif os.getenv('CONAN_BOOST_B2_GROUP_BUILD', '0') == '1' and \
+                    len(self.boost_build_members) > 1:
+                self._run_b2(self._b2_command([
+                    lib + "-build"
+                    for lib in sorted(self.boost_build_members)]))
+                self._b2_built_all_ = True
+
+        # Build each library. Except for header only packages, which only
+        # need the jamroot.jam written by `package`. And the members of a
+        # cycle group not selected to build.
+        build_members = self.boost_build_members
         for lib in self.boost_libs:
-            self._build_lib(lib)
+            if not self.is_header_only(lib) and lib not in build_members:
+                continue
+            if not self.is_header_only_package:
+                self._build_lib(lib)
             for mixin in self.boost_mixins:
                 mixin.build_lib(lib)
 
@@ -441,40 +856,7 @@ class BoostBaseConan(ConanFile):
         This jamfile contains most of the configuration, and patching magic,
         to build the individual libraries.
         '''
-        # TODO: Rewrite to use a less kludgy template system.
-        content = load(os.path.join(
-            self.base_source_path, 'src', 'template', 'jamroot.jam'))
-        jam_include_paths = ' '.join(
-            '"' + path + '"' for path in self.deps_cpp_info.includedirs
-        ).replace('\\', '/')
-        content = content \
-            .replace("{{{toolset}}}", self.b2_toolset) \
-            .replace("{{{libraries}}}", " ".join(self.boost_libs)) \
-            .replace("{{{boost_version}}}", self.version) \
-            .replace("{{{deps.include_paths}}}", jam_include_paths) \
-            .replace("{{{os}}}", self.b2_os) \
-            .replace("{{{address_model}}}", self.b2_address_model) \
-            .replace("{{{architecture}}}", self.b2_architecture) \
-            .replace(
-                "{{{deps_info}}}", self._b2_dependencies_for_jamroot_jam) \
-            .replace("{{{variant}}}", self.b2_variant) \
-            .replace("{{{name}}}", self.name) \
-            .replace("{{{link}}}", self.b2_link) \
-            .replace("{{{runtime_link}}}", self.b2_runtime_link) \
-            .replace("{{{toolset_version}}}", self.b2_toolset_version) \
-            .replace("{{{toolset_exec}}}", self.b2_toolset_exec) \
-            .replace("{{{libcxx}}}", self.b2_libcxx) \
-            .replace("{{{cxxstd}}}", self.b2_cxxstd) \
-            .replace("{{{cxxabi}}}", self.b2_cxxabi) \
-            .replace("{{{libpath}}}", self.b2_icu_lib_paths) \
-            .replace("{{{arch_flags}}}", self.b2_arch_flags) \
-            .replace("{{{isysroot}}}", self.b2_isysroot) \
-            .replace("{{{os_version}}}", self.b2_os_version) \
-            .replace("{{{fpic}}}", self.b2_fpic) \
-            .replace("{{{threading}}}", self.b2_threading) \
-            .replace("{{{threadapi}}}", self.b2_threadapi) \
-            .replace("{{{profile_flags}}}", self.b2_profile_flags)
-        save(os.path.join(self.build_folder, 'jamroot.jam'), content)
+        self._write_jam_template('jamroot.jam')
 
     def _write_project_config_jam(self):
         '''
@@ -482,32 +864,87 @@ class BoostBaseConan(ConanFile):
         This file contains the configuration that maps from the Conan provided
         tool and packaged libraries to the B2 equivalent.
         '''
-        # TODO: Rewrite to use a less kludgy template system.
-        content = load(os.path.join(
-            self.base_source_path, 'src', 'template', 'project-config.jam'))
-        content = content \
-            .replace("{{{toolset}}}", self.b2_toolset) \
-            .replace("{{{toolset_version}}}", self.b2_toolset_version) \
-            .replace("{{{toolset_exec}}}", self.b2_toolset_exec) \
-            .replace("{{{zlib_lib_paths}}}", self.zlib_lib_paths) \
-            .replace("{{{zlib_include_paths}}}", self.zlib_include_paths) \
-            .replace("{{{zlib_name}}}", self.zlib_lib_name) \
-            .replace("{{{bzip2_lib_paths}}}", self.bzip2_lib_paths) \
-            .replace("{{{bzip2_include_paths}}}", self.bzip2_include_paths) \
-            .replace("{{{bzip2_name}}}", self.bzip2_lib_name) \
-            .replace("{{{lzma_lib_paths}}}", self.lzma_lib_paths) \
-            .replace("{{{lzma_include_paths}}}", self.lzma_include_paths) \
-            .replace("{{{lzma_name}}}", self.lzma_lib_name) \
-            .replace("{{{zstd_lib_paths}}}", self.zstd_lib_paths) \
-            .replace("{{{zstd_include_paths}}}", self.zstd_include_paths) \
-            .replace("{{{zstd_name}}}", self.zstd_lib_name) \
-            .replace("{{{python_exec}}}", self.b2_python_exec) \
-            .replace("{{{python_version}}}", self.b2_python_version) \
-            .replace("{{{python_include}}}", self.b2_python_include) \
-            .replace("{{{python_lib}}}", self.b2_python_lib) \
-            .replace("{{{mpicxx}}}", self.b2_mpicxx) \
-            .replace("{{{profile_tools}}}", self.b2_profile_tools)
-        save(os.path.join(self.build_folder, 'project-config.jam'), content)
+        self._write_jam_template('project-config.jam')
+
+    def _write_jam_template(self, name):
+        template = BoostJamTemplate.load(os.path.join(
+            self.base_source_path, 'src', 'template', name))
+        save(
+            os.path.join(self.build_folder, name),
+            template.render(self._jam_template_values))
+
+    @property
+    def _dep_include_paths(self):
+        '''
+        The include dirs of the dependencies to build with. Which, with
+        `CONAN_BOOST_MERGED_INCLUDES=1`, has a single merged include dir for
+        all the Boost dependencies.
+        '''
+        if os.getenv('CONAN_BOOST_MERGED_INCLUDES', '0') == '1':
+            return boost_merged_include_paths(self.deps_cpp_info)
+        return self.deps_cpp_info.includedirs
+
+    @property
+    def _jam_template_values(self):
+        '''
+        The functions that compute the value of each of the template
+        placeholders. Only the ones in a template get called.
+        '''
+        return {
+            "toolset": lambda: self.b2_toolset,
+            "libraries": lambda: " ".join(self.boost_libs),
+            "variants": lambda: " ".join(
+                "%s-%s" % (link, variant)
+                for link, variant in self._b2_multi_variants or []),
+            "boost_version": lambda: self.version,
+            "deps.include_paths": lambda: ' '.join(
+                '"' + path + '"' for path in self._dep_include_paths
+            ).replace('\\', '/'),
+            "os": lambda: self.b2_os,
+            "address_model": lambda: self.b2_address_model,
+            "architecture": lambda: self.b2_architecture,
+            "deps_info": lambda: self._b2_dependencies_for_jamroot_jam,
+            # The variants built together are given in the B2 command.
+            # So that the jamroot is the same for all of them.
+            "variant": lambda:
+                "release" if self._b2_multi_variants else self.b2_variant,
+            "name": lambda: self.name,
+            "link": lambda:
+                "static" if self._b2_multi_variants else self.b2_link,
+            "runtime_link": lambda: self.b2_runtime_link,
+            "toolset_version": lambda: self.b2_toolset_version,
+            "toolset_exec": lambda: self.b2_toolset_exec,
+            "toolset_command": lambda: self.b2_toolset_command,
+            "libcxx": lambda: self.b2_libcxx,
+            "cxxstd": lambda: self.b2_cxxstd,
+            "cxxabi": lambda: self.b2_cxxabi,
+            "libpath": lambda: self.b2_icu_lib_paths,
+            "arch_flags": lambda: self.b2_arch_flags,
+            "isysroot": lambda: self.b2_isysroot,
+            "os_version": lambda: self.b2_os_version,
+            "fpic": lambda: self.b2_fpic,
+            "threading": lambda: self.b2_threading,
+            "threadapi": lambda: self.b2_threadapi,
+            "profile_flags": lambda: self.b2_profile_flags,
+            "zlib_lib_paths": lambda: self.zlib_lib_paths,
+            "zlib_include_paths": lambda: self.zlib_include_paths,
+            "zlib_name": lambda: self.zlib_lib_name,
+            "bzip2_lib_paths": lambda: self.bzip2_lib_paths,
+            "bzip2_include_paths": lambda: self.bzip2_include_paths,
+            "bzip2_name": lambda: self.bzip2_lib_name,
+            "lzma_lib_paths": lambda: self.lzma_lib_paths,
+            "lzma_include_paths": lambda: self.lzma_include_paths,
+            "lzma_name": lambda: self.lzma_lib_name,
+            "zstd_lib_paths": lambda: self.zstd_lib_paths,
+            "zstd_include_paths": lambda: self.zstd_include_paths,
+            "zstd_name": lambda: self.zstd_lib_name,
+            "python_exec": lambda: self.b2_python_exec,
+            "python_version": lambda: self.b2_python_version,
+            "python_include": lambda: self.b2_python_include,
+            "python_lib": lambda: self.b2_python_lib,
+            "mpicxx": lambda: self.b2_mpicxx,
+            "profile_tools": lambda: self.b2_profile_tools,
+        }
 
     def _write_short_path_cmd(self):
         '''
@@ -560,58 +997,15 @@ class BoostBaseConan(ConanFile):
                 lib=lib)
             tools.save(jam_file, jamroot_content, append=True)
         else:
-            # Construct the B2 build command:
-            b2_command = [
-                # B2 executable, which comes in as a dependency.
-                "b2",
-                # Use all available for parallel build.
-                "-j%s" % (tools.cpu_count()),
-                # Optionally add debug output information. Default of +d1
-                # just shows the actions executed.
-                "-d+%s" % (os.getenv('CONAN_B2_DEBUG', '1')),
-                # We need to do full rebuilds.
-                "-a",
-                # Avoid long intermediate paths by using hashed variant
-                # dirs.
-                "--hash=yes",
-                # We always print out configuration info to aid in build
-                # debugging.
-                "--debug-configuration",
-                # We use the bare "system" naming that avoids extra
-                # tagging. This simplifies the logic for finding and using
-                # specific libraries. And we don't need the extended
-                # tagging as Conan segregates variants similarly like B2.
-                "--layout=system"
-            ]
-            # Add the B2 features needed as defined by the package.
-            b2_command += [
-                key + "=" + value
-                for key, value in self.boost_build_options.items()]
-            # Add cpp defines as needed.
-            b2_command += [
-                "define=" + define
-                for define in self.boost_build_defines]
-            # Add include dirs of source only dependencies nneded for
-            # building.
-            b2_command += [
-                "include=" + lib + '/include'
-                for lib in self.boost_source_only_deps]
-            # Finally, add the target we build. This is a special target
-            # that build just the library we need.
-            b2_command += [lib + "-build"]
-            # Lets now do the build, but first debug output what we are
-            # about to run.
-            self.output.info(
-                "%s: %s" % (os.getcwd(), " ".join(b2_command)))
-            # TODO: Why do we add ${MPI_BIN} to PATH?
-            with tools.environment_append({
-                'PATH': [os.getenv('MPI_BIN', '')]
-            }):
-                self.run(" ".join(b2_command))
+            # Build just the library we need, unless we built all of them
+            # already.
+            if not getattr(self, '_b2_built_all_', False):
+                self._run_b2(self._b2_command([lib + "-build"]))
 
             # For each library built add to the exported jamroot.jam
             # information about that library.
             libs = self._collect_build_libs(lib_dir)
+            self._write_lib_manifest(lib, lib_dir, libs)
             for lib_link_name in libs:
                 search_content = self.jamroot_search_content.format(
                     lib_link_name=lib_link_name)
@@ -626,6 +1020,317 @@ class BoostBaseConan(ConanFile):
                     space_joined_libs=" ".join(libs))
                 tools.save(jam_file, alias_content, append=True)
 
+    def _b2_command(self, targets):
+        '''
+        The B2 command line to build the given `targets`.
+        '''
+        # Construct the B2 build command:
+        b2_command = [
+            # B2 executable, which comes in as a dependency.
+            "b2",
+            # Use all available for parallel build.
+            "-j%s" % (tools.cpu_count()),
+            # Optionally add debug output information. Default of +d1
+            # just shows the actions executed.
+            "-d+%s" % (os.getenv('CONAN_B2_DEBUG', '1')),
+            # Avoid long intermediate paths by using hashed variant
+            # dirs.
+            "--hash=yes",
+            # We always print out configuration info to aid in build
+            # debugging.
+            "--debug-configuration",
+            # We use the bare "system" naming that avoids extra
+            # tagging. This simplifies the logic for finding and using
+            # specific libraries. And we don't need the extended
+            # tagging as Conan segregates variants similarly like B2.
+            "--layout=system"
+        ]
+        if getattr(self, '_b2_build_dir_', None):
+            # Incremental builds happen in a persistent build dir.
+            b2_command += ['"--build-dir=%s"' % (
+                self._b2_build_dir_.replace('\\', '/'))]
+        if not getattr(self, '_b2_incremental_', False):
+            # We need to do full rebuilds.
+            b2_command += ["-a"]
+        if self._b2_multi_variants:
+            # All the variants built together. B2 builds each combination.
+            b2_command += [
+                "link=" + ",".join(sorted(set(
+                    [link for link, _ in self._b2_multi_variants]))),
+                "variant=" + ",".join(sorted(set(
+                    [variant for _, variant in self._b2_multi_variants])))]
+        # Add the B2 features needed as defined by the package.
+        b2_command += [
+            key + "=" + value
+            for key, value in self.boost_build_options.items()]
+        # Add cpp defines as needed.
+        b2_command += [
+            "define=" + define
+            for define in self.boost_build_defines]
+        # Add include dirs of source only dependencies, and bundled headers,
+        # needed for building.
+        b2_command += [
+            "include=" + lib + '/include'
+            for lib in
+            self.boost_source_only_deps + self.boost_bundled_headers]
+        # Finally, add the targets we build. These are special targets
+        # that build just the library we need.
+        b2_command += targets
+        return b2_command
+
+    def _run_b2(self, b2_command):
+        # Lets now do the build, but first debug output what we are
+        # about to run.
+        self.output.info(
+            "%s: %s" % (os.getcwd(), " ".join(b2_command)))
+        # TODO: Why do we add ${MPI_BIN} to PATH?
+        env = {'PATH': [os.getenv('MPI_BIN', '')]}
+        env.update(self._compiler_cache_env())
+        stats_before = self._compiler_cache_stats()
+        with self._boost_phase('b2', targets=[
+                arg for arg in b2_command if arg.endswith('-build')]), \
+                tools.environment_append(env):
+            self.run(" ".join(b2_command))
+        self._record_compiler_cache_stats(stats_before)
+
+    def _compiler_cache_env(self):
+        '''
+        Environment for the compiler cache to use the shared cache dir. For
+        ccache we also make paths relative to the common root of the build
+        and dependencies. Which makes the cache work across the different
+        build folders of each package.
+        '''
+        launcher = self.b2_compiler_launcher
+        if not launcher:
+            return {}
+        cache_dir = os.getenv(
+            'CONAN_BOOST_COMPILER_CACHE_DIR', boost_cache_dir('compiler'))
+        if 'sccache' in os.path.basename(launcher):
+            return {'SCCACHE_DIR': cache_dir}
+        env = {'CCACHE_DIR': cache_dir}
+        if 'CCACHE_BASEDIR' not in os.environ:
+            env['CCACHE_BASEDIR'] = os.path.dirname(os.path.commonprefix(
+                [self.build_folder + os.sep] +
+                [path + os.sep for path in self.deps_cpp_info.rootpaths]))
+        return env
+
+    def _compiler_cache_stats(self):
+        '''
+        The current compiler cache hit and miss counts, or "None" when not
+        available. The counts are for the whole cache, which is shared.
+        Hence with concurrent builds the difference across a build is only an
+        approximation for that build.
+        '''
+        launcher = self.b2_compiler_launcher
+        if not launcher:
+            return None
+        try:
+            with tools.environment_append(self._compiler_cache_env()):
+                if 'sccache' in os.path.basename(launcher):
+                    stats = json.loads(self.command_output([
+                        launcher, '--show-stats', '--stats-format=json'
+                    ]))['stats']
+                    return {
+                        'hits': sum(stats['cache_hits']['counts'].values()),
+                        'misses': sum(
+                            stats['cache_misses']['counts'].values())}
+                stats = {}
+                for line in self.command_output(
+                        [launcher, '--print-stats']).splitlines():
+                    key, _, value = line.partition('\t')
+                    stats[key] = int(value)
+                return {
+                    'hits': stats.get('direct_cache_hit', 0) +
+                    stats.get('preprocessed_cache_hit', 0),
+                    'misses': stats.get('cache_miss', 0)}
+        except Exception as e:
+            self.output.warn("Can't get compiler cache stats: %s" % (e))
+            return None
+
+    def _record_compiler_cache_stats(self, stats_before):
+        '''
+        Prints, and saves to the build folder, the compiler cache hits and
+        misses of the last build.
+        '''
+        stats_after = self._compiler_cache_stats()
+        if not stats_before or not stats_after:
+            return
+        stats_file = os.path.join(
+            self.build_folder, 'compiler-cache-stats.json')
+        stats = {'hits': 0, 'misses': 0}
+        if os.path.isfile(stats_file):
+            stats = json.loads(tools.load(stats_file))
+        for key in ['hits', 'misses']:
+            stats[key] += stats_after[key] - stats_before[key]
+        save(stats_file, json.dumps(stats))
+        self.output.info("Compiler cache: %s hits, %s misses." % (
+            stats['hits'], stats['misses']))
+
+    def _setup_incremental_build(self):
+        '''
+        Sets up building in a persistent B2 build dir, in the shared cache,
+        keyed by the generated B2 configuration and the sources. When that
+        build dir already exists we have built this exact configuration
+        before, perhaps only partially, and can avoid a full rebuild.
+        '''
+        self._b2_build_dir_ = boost_cache_dir(
+            'builds', '%s-%s' % (self.name, self.version),
+            self._b2_configuration_digest()[0:16])
+        self._b2_incremental_ = os.path.isdir(self._b2_build_dir_)
+        if self._b2_incremental_:
+            self.output.info(
+                "Incremental build in: %s" % (self._b2_build_dir_))
+        else:
+            self.output.info("Full build in: %s" % (self._b2_build_dir_))
+            tools.mkdir(self._b2_build_dir_)
+
+    def _b2_configuration_digest(self):
+        '''
+        Digest of everything that determines what B2 builds. The generated B2
+        configuration, the B2 command options, and the sources.
+        '''
+        key = hashlib.sha256()
+        for jam_file in ['jamroot.jam', 'project-config.jam']:
+            key.update(tools.load(
+                os.path.join(self.build_folder, jam_file)).encode('utf-8'))
+        # The parallelism, output, rebuild, and build dir options don't change
+        # what we build.
+        key.update(" ".join([
+            arg for arg in self._b2_command([])
+            if not arg.startswith('-j') and not arg.startswith('-d') and
+            arg != '-a' and not arg.startswith('"--build-dir=')
+        ]).encode('utf-8'))
+        key.update(self._b2_source_signature().encode('utf-8'))
+        return key.hexdigest()
+
+    @property
+    def _b2_multi_variants(self):
+        '''
+        The `(link, variant)` combinations to build together, with
+        `CONAN_BOOST_MULTI_VARIANT`, or `None` to build only our own. Naming
+        a link, or build type, builds both of them, and only our own of the
+        other. So the packages of all the variants agree on the combinations,
+        and share the area of the first to build. We only build ours when any
+        of the dependencies has libraries, as those differ for each variant
+        and Conan only gives us the one for ours.
+        '''
+        if not hasattr(self, '_b2_multi_variants_'):
+            self._b2_multi_variants_ = None
+            value = os.getenv('CONAN_BOOST_MULTI_VARIANT', '0')
+            if value == '0' or self.is_header_only_package:
+                return None
+            known = ['static', 'shared', 'debug', 'release']
+            values = known if value == '1' else [
+                v.strip() for v in value.split(',') if v.strip()]
+            unknown = set(values) - set(known)
+            if unknown:
+                raise Exception(
+                    "Unknown CONAN_BOOST_MULTI_VARIANT '%s', expected 1, or "
+                    "some of: %s." % (value, ", ".join(known)))
+            links = [self.b2_link]
+            if set(values) & set(['static', 'shared']):
+                links = ['shared', 'static']
+            variants = [self.b2_variant]
+            if set(values) & set(['debug', 'release']):
+                variants = ['debug', 'release']
+            if len(links) * len(variants) == 1:
+                return None
+            for dep_name, dep_cpp_info in self.deps_cpp_info.dependencies:
+                if dep_cpp_info.libs:
+                    self.output.info(
+                        "Building only the %s %s variant, as %s has "
+                        "libraries." % (
+                            self.b2_link, self.b2_variant, dep_name))
+                    return None
+            self._b2_multi_variants_ = [
+                (link, variant) for link in links for variant in variants]
+        return self._b2_multi_variants_
+
+    def _build_multi_variant(self):
+        '''
+        Builds all the `_b2_multi_variants` of the libraries with a single B2
+        invocation, which shares the configuration checks and the dependency
+        scan. They are built into an area in the shared cache, keyed by the
+        B2 configuration and sources, by the first package of them to build.
+        The packages of the other variants then only take their variant from
+        the area.
+        '''
+        variants = [
+            "%s-%s" % (link, variant)
+            for link, variant in self._b2_multi_variants]
+        libs = sorted(self.boost_build_members)
+        # Keyed by the libraries too, as cycle groups might build only some.
+        area = boost_cache_dir(
+            'variants', '%s-%s' % (self.name, self.version),
+            hashlib.sha256((
+                self._b2_configuration_digest() + " ".join(libs)
+            ).encode('utf-8')).hexdigest()[0:16])
+        done_file = os.path.join(area, 'variants.json')
+        tools.mkdir(os.path.dirname(area))
+        with boost_lock(area + '.lock'):
+            if os.path.isfile(done_file):
+                self.output.info("Using the variants built in: %s" % (area))
+            else:
+                self.output.info("Building the %s variants in: %s" % (
+                    " ".join(variants), area))
+                # Remove any partial area, from a failed build.
+                shutil.rmtree(area, ignore_errors=True)
+                self._run_b2(self._b2_command(
+                    [lib + "-build" for lib in libs]))
+                for lib in libs:
+                    tools.mkdir(os.path.join(area, lib))
+                    for variant in variants:
+                        variant_dir = os.path.join(
+                            self.build_folder, lib, 'lib', variant)
+                        if os.path.isdir(variant_dir):
+                            shutil.move(
+                                variant_dir, os.path.join(area, lib, variant))
+                save(done_file, json.dumps({
+                    'libs': libs, 'variants': variants}))
+        # Take our variant into the usual lib dir. As copies, because the
+        # jamroot.jam gets appended to.
+        variant = "%s-%s" % (self.b2_link, self.b2_variant)
+        for lib in libs:
+            variant_dir = os.path.join(area, lib, variant)
+            lib_dir = os.path.join(self.build_folder, lib, 'lib')
+            if not os.path.isdir(variant_dir):
+                raise Exception(
+                    "The variants built in %s have no %s variant of %s." % (
+                        area, variant, lib))
+            tools.mkdir(lib_dir)
+            for name in os.listdir(variant_dir):
+                shutil.copy2(
+                    os.path.join(variant_dir, name),
+                    os.path.join(lib_dir, name))
+        self._b2_built_all_ = True
+
+    def _b2_source_signature(self):
+        '''
+        A cheap signature of the sources we build from, using the path, size,
+        and modification time of each file. Extracting, and copying, the
+        sources preserves the modification times. Hence the signature only
+        changes when the sources do.
+        '''
+        signature = [
+            tools.load(os.path.join(self.build_folder, 'boostcpp.jam'))]
+        for lib in sorted(
+                self.boost_libs + self.boost_source_only_deps +
+                self.boost_bundled_headers):
+            lib_dir = os.path.join(self.build_folder, lib)
+            for root, dirs, files in os.walk(lib_dir):
+                # Skip the build output.
+                if root == lib_dir and 'lib' in dirs:
+                    dirs.remove('lib')
+                dirs.sort()
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    signature.append("%s:%s:%s" % (
+                        os.path.relpath(path, self.build_folder).replace(
+                            '\\', '/'),
+                        stat.st_size, int(stat.st_mtime)))
+        return "\n".join(signature)
+
     # Jamroot.jam for header only libs. It declares:
     # ROOT({lib}) -- path to the root of the exported package.
     # /conan/{lib} -- project requirements.
@@ -656,9 +1361,18 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
     def _collect_build_libs(self, lib_folder):
         '''
         Searches the build output for any libraries built and returns the
-        simple basename of those libraries.
+        simple basename of those libraries. In link order, see
+        `_lib_link_order`.
         '''
-        libs = []
+        return self._lib_link_order(
+            lib_folder, self._collect_build_lib_files(lib_folder).values())
+
+    def _collect_build_lib_files(self, lib_folder):
+        '''
+        Searches the build output for any libraries built and returns a
+        dictionary of the file names to the simple basename of the library.
+        '''
+        lib_files = {}
         if not os.path.exists(lib_folder):
             self.output.warn(
                 "Lib folder doesn't exist, can't collect libraries: " +
@@ -670,8 +1384,112 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
                 if ext in (".so", ".lib", ".a", ".dylib"):
                     if ext != ".lib" and name.startswith("lib"):
                         name = name[3:]
-                    libs.append(name)
-        return libs
+                    lib_files[f] = name
+        return lib_files
+
+    def _lib_link_order(self, lib_folder, libs):
+        '''
+        Orders the `libs` in a lib dir dependents first. Lib dirs built with
+        their dependencies also have the libraries of those. A library goes
+        before the ones of the Boost libraries in its `b2_requires_closure`.
+        Libraries that don't require each other, like the ones of the same
+        Boost library, or cycle group, go in a stable order. The ones of the
+        lib dir's own Boost library first. Of those the main `boost_<lib>`
+        library, and its variants, are used by the other ones, like
+        `boost_log_setup`, so they go last and the longest names first. The
+        rest in name order.
+        '''
+        self.boost_init()
+        own_lib = os.path.basename(os.path.dirname(
+            os.path.normpath(lib_folder)))
+        main_name = "boost_" + own_lib
+        boost_libs = sorted([
+            lib for lib, info in self._boost_data_.items()
+            if tuple(info['lib_short_names']) == (lib,)],
+            key=len, reverse=True)
+
+        def boost_lib(name):
+            # The Boost library of a built library. Those not named after one
+            # are the lib dir's own, like `boost_unit_test_framework`.
+            for lib in boost_libs:
+                if name == "boost_" + lib or \
+                        name.startswith("boost_" + lib + "_"):
+                    return lib
+            return own_lib
+
+        def closure(lib):
+            if lib not in self._boost_data_:
+                return set()
+            return set(self._boost_data_[lib]['b2_requires_closure'])
+
+        def key(name):
+            if boost_lib(name) == own_lib:
+                if name.startswith(main_name):
+                    return (1, -len(name), name)
+                return (0, 0, name)
+            return (2, 0, name)
+
+        # Topological sort, taking the first in key order of the libraries
+        # that no remaining library requires.
+        libs = sorted(set(libs), key=key)
+        required_by = dict([(name, set()) for name in libs])
+        for name in libs:
+            requires = closure(boost_lib(name))
+            for dep in libs:
+                if boost_lib(dep) in requires:
+                    required_by[dep].add(name)
+        result = []
+        while libs:
+            name = next(
+                (name for name in libs if not required_by[name]), None)
+            if name is None:
+                raise Exception(
+                    "The libraries in %s require each other: %s" % (
+                        lib_folder, ", ".join(libs)))
+            libs.remove(name)
+            result.append(name)
+            for dep in libs:
+                required_by[dep].discard(name)
+        return result
+
+    # The name of the manifest of the libraries built in each lib dir.
+    lib_manifest_name = "boost-libs.json"
+
+    def _write_lib_manifest(self, lib, lib_folder, libs):
+        '''
+        Writes the manifest of the built `libs`, in link order, with the size
+        and hash of their files. Which `package_info` reads to avoid searching
+        the lib dir for each consumer.
+        '''
+        lib_files = self._collect_build_lib_files(lib_folder)
+        manifest = {'lib': lib, 'libs': []}
+        for name in libs:
+            files = []
+            for f in sorted(lib_files.keys()):
+                if lib_files[f] == name:
+                    path = os.path.join(lib_folder, f)
+                    files.append({
+                        'file': f,
+                        'size': os.path.getsize(path),
+                        'sha256': boost_file_sha256(path)})
+            manifest['libs'].append({'name': name, 'files': files})
+        save(
+            os.path.join(lib_folder, self.lib_manifest_name),
+            json.dumps(manifest, indent=1, sort_keys=True))
+
+    def _manifest_libs(self, lib_dir):
+        '''
+        The libraries, in link order, from the manifest in `lib_dir`. For
+        packages built without a manifest this searches the lib dir.
+        '''
+        manifest_file = os.path.join(
+            self.package_folder, lib_dir, self.lib_manifest_name)
+        if os.path.isfile(manifest_file):
+            return [
+                entry['name']
+                for entry in json.loads(load(manifest_file))['libs']]
+        return self._lib_link_order(
+            lib_dir, tools.collect_libs(self, lib_dir))
 
     def package(self):
         '''
@@ -681,13 +1499,124 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
             self.copy("LICENSE.txt", dst="licenses", src="src")
         else:
             self.boost_init()
-            for lib in self.boost_libs:
-                self.copy(pattern="*LICENSE*", dst="licenses", src=lib)
-                for subdir in ["lib", "include"]:
-                    copydir = os.path.join(lib, subdir)
-                    self.copy(pattern="*", dst=copydir, src=copydir)
-            for mixin in self.boost_mixins:
-                mixin.package()
+            with self._boost_phase('package') as phase:
+                links = os.getenv('CONAN_BOOST_PACKAGE_LINKS', '0')
+                if links not in ('0', '1', 'hardlink', 'reflink'):
+                    raise Exception(
+                        "Unknown CONAN_BOOST_PACKAGE_LINKS '%s', expected "
+                        "one of: 0, 1, hardlink, reflink." % (links))
+                linked = {'copy': 0, 'hardlink': 0, 'reflink': 0, 'bytes': 0}
+                # The bundled headers only have an include dir.
+                for lib in self.boost_libs + self.boost_bundled_headers:
+                    self.copy(pattern="*LICENSE*", dst="licenses", src=lib)
+                    for subdir in ["lib", "include"]:
+                        copydir = os.path.join(lib, subdir)
+                        if links != '0':
+                            self._package_link_dir(copydir, links, linked)
+                        else:
+                            self.copy(pattern="*", dst=copydir, src=copydir)
+                if links != '0':
+                    self.output.info(
+                        "Packaged %s files by reflink, %s by hardlink, and "
+                        "%s by copy. Avoided copying %s bytes." % (
+                            linked['reflink'], linked['hardlink'],
+                            linked['copy'], linked['bytes']))
+                    phase['linked'] = linked
+                if self.is_header_only_package:
+                    # Header only libs only get the jamroot.jam file in the
+                    # lib exported dir.
+                    for lib in self.boost_libs:
+                        save(
+                            os.path.join(
+                                self.package_folder, lib, "lib",
+                                "jamroot.jam"),
+                            self.jamroot_header_only_content.format(lib=lib))
+                for mixin in self.boost_mixins:
+                    mixin.package()
+                if os.getenv('CONAN_BOOST_HEADER_STORE', '0') == '1':
+                    self._package_dedupe_headers()
+                phase.update(self._package_artifact_sizes())
+
+    def _package_dedupe_headers(self):
+        '''
+        Replaces the packaged headers with links to the same headers in the
+        machine wide header store. As the headers are the same for all the
+        binary packages, and mostly across versions, this keeps only one copy
+        of each in the Conan cache.
+        '''
+        with self._boost_phase('dedupe') as phase:
+            headers = []
+            for lib in self.boost_libs + self.boost_bundled_headers:
+                include_dir = os.path.join(self.package_folder, lib, "include")
+                for dirpath, _, files in os.walk(include_dir):
+                    headers.extend([os.path.join(dirpath, f) for f in files])
+            stats = boost_dedupe_files(boost_cache_dir('headers'), headers)
+            self.output.info(
+                "Linked %s of %s headers to the header store, saving %s "
+                "bytes." % (stats['linked'], stats['files'], stats['saved']))
+            phase.update(stats)
+
+    def _package_link_dir(self, subdir, links, linked):
+        '''
+        Packages all the files in `subdir`, of both the source and build
+        folders, by linking them when possible. See `boost_link_file` for
+        the `links` modes. Counts how each file was packaged, and the bytes
+        not copied, in `linked`.
+        '''
+        roots = [self.source_folder]
+        if self.build_folder and \
+                os.path.realpath(self.build_folder) != \
+                os.path.realpath(self.source_folder):
+            roots.append(self.build_folder)
+        for root in roots:
+            src_dir = os.path.join(root, subdir)
+            for dirpath, _, files in os.walk(src_dir):
+                for name in files:
+                    src = os.path.join(dirpath, name)
+                    dst = os.path.join(
+                        self.package_folder, subdir,
+                        os.path.relpath(src, src_dir))
+                    how = boost_link_file(src, dst, links)
+                    linked[how] += 1
+                    if how != 'copy':
+                        linked['bytes'] += os.path.getsize(src)
+
+    def _package_artifact_sizes(self):
+        '''
+        The total count and size of the packaged files. And the size of each
+        packaged library binary.
+        '''
+        sizes = {'files': 0, 'bytes': 0, 'artifacts': {}}
+        for root, _, files in os.walk(self.package_folder):
+            for name in files:
+                size = os.path.getsize(os.path.join(root, name))
+                sizes['files'] += 1
+                sizes['bytes'] += size
+                if os.path.basename(root) == 'lib' and \
+                        not name.endswith('.jam') and \
+                        name != self.lib_manifest_name:
+                    sizes['artifacts'][name] = size
+        return sizes
+
+    @contextmanager
+    def _boost_phase(self, phase, **data):
+        '''
+        Times the enclosed `phase` of creating the package and records it to
+        the `CONAN_BOOST_TELEMETRY` event stream. The yielded `data`
+        dictionary can be updated with extra information to record.
+        '''
+        start = time.time()
+        event = {'ok': False}
+        try:
+            yield data
+            event['ok'] = True
+        finally:
+            event.update(data)
+            event.update({
+                'source': 'recipe', 'phase': phase,
+                'package': self.name, 'version': self.version,
+                'start': start, 'duration': time.time() - start})
+            boost_telemetry(event)
 
     def package_info(self):
         '''
@@ -717,7 +1646,7 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
         elif self.boost_cycle_group:
             # For a library in a cycle group we steal some info from the cycle
             # group. Hence this ends up "aliasing" the group content.
-            group = self.deps_cpp_info['boost_'+self.boost_cycle_group]
+            group = self.deps_cpp_info[self.boost_cycle_group_package]
             # Point the include dir to the group sublib include dir.
             include_dir = os.path.join(
                 group.rootpath, self.boost_libs[0], "include")
@@ -730,7 +1659,18 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
             # the group sublib lib dir to this package. This has the effect
             # of consumer linking to the sublib specific targets only.
             if not self.is_header_only(self.boost_libs[0]):
-                self.cpp_info.libs.extend(tools.collect_libs(self, lib_dir))
+                built = self.deps_user_info[
+                    self.boost_cycle_group_package].vars.get(
+                        'boost_built_libs')
+                if built is not None and \
+                        self.boost_libs[0] not in built.split(','):
+                    raise Exception(
+                        "The %s library was not built by %s, which only "
+                        "built: %s. Add it to the build_members option of "
+                        "%s." % (
+                            self.boost_libs[0], self.boost_cycle_group_package,
+                            built or 'none', self.boost_cycle_group_package))
+                self.cpp_info.libs.extend(self._manifest_libs(lib_dir))
         else:
             # Otherwise we are a regular built lib and can add include dir,
             # lib dir, and libs directly in this package.
@@ -739,15 +1679,21 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
             lib_dir = os.path.join(self.boost_libs[0], "lib")
             self.cpp_info.libdirs.append(lib_dir)
             if not self.is_header_only(self.boost_libs[0]):
-                self.cpp_info.libs.extend(tools.collect_libs(self, lib_dir))
+                self.cpp_info.libs.extend(self._manifest_libs(lib_dir))
+        for lib in self.boost_bundled_headers:
+            self.cpp_info.includedirs.append(os.path.join(lib, "include"))
 
         # Since we explicitly specify all the libs we need to use we turn off
         # the Boost built-in mechanism for automatic linking of libraries on
         # some platforms (i.e. MSVC)
         self.cpp_info.defines.append("BOOST_ALL_NO_LIB=1")
         self.cpp_info.bindirs.extend(self.cpp_info.libdirs)
-        # Avoid duplicate entries in the libs.
-        self.cpp_info.libs = list(set(self.cpp_info.libs))
+        # Avoid duplicate entries in the libs, keeping the link order.
+        libs = []
+        for lib in self.cpp_info.libs:
+            if lib not in libs:
+                libs.append(lib)
+        self.cpp_info.libs = libs
 
         for mixin in self.boost_mixins:
             mixin.package_info()
@@ -864,42 +1810,136 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
 
     @property
     def b2_toolset_exec(self):
-        class dev_null(object):
+        '''
+        The compiler executable to configure the toolset with. Finding it
+        runs the candidate compilers. So the probe result is cached, per
+        settings, `CXX`, and `PATH`, in this process and on disk for all the
+        packages. Either cache entry is probed again if the compiler binary
+        changes, by its modification time. Probes that found no compiler
+        binary are only cached in this process, as there's nothing to tell
+        when one gets installed.
+        '''
+        probe_key = hashlib.sha1(json.dumps([
+            self.b2_os, self.b2_toolset, str(self.settings.compiler.version),
+            os.getenv('CXX'), os.getenv('PATH')]).encode('utf-8')).hexdigest()
+        probe = self._b2_toolchain_probes.get(probe_key)
+        if probe and probe['mtime'] and \
+                self._b2_toolchain_mtime(probe['path']) != probe['mtime']:
+            probe = None
+        if not probe:
+            probe_file = boost_cache_dir('toolchains', probe_key + '.json')
+            if os.path.isfile(probe_file):
+                try:
+                    probe = json.loads(load(probe_file))
+                except ValueError:
+                    probe = None
+            if not probe or not probe.get('mtime') or \
+                    self._b2_toolchain_mtime(probe['path']) != probe['mtime']:
+                probe = self._b2_toolchain_probe()
+                probe['path'] = None
+                if probe['exec'] != "$(DEFAULT)":
+                    probe['path'] = tools.which(probe['exec']) or \
+                        probe['exec']
+                probe['mtime'] = self._b2_toolchain_mtime(probe['path'])
+                if probe['mtime']:
+                    # A concurrent reader could see a partial file. Which is
+                    # fine as it fails to parse and it probes again.
+                    save(probe_file, json.dumps(probe))
+                elif os.path.isfile(probe_file):
+                    os.remove(probe_file)
+            else:
+                self.output.info(
+                    "Using cached toolchain probe: %s" % (probe['exec']))
+            self._b2_toolchain_probes[probe_key] = probe
+        return probe['exec']
+
+    # Toolchain probes done in this process, shared by all the packages.
+    _b2_toolchain_probes = {}
+
+    def _b2_toolchain_mtime(self, path):
+        if path and os.path.isfile(path):
+            return os.path.getmtime(path)
+        return None
+
+    def _b2_toolchain_probe(self):
+        '''
+        Finds the compiler executable for the toolset by trying to run the
+        candidates. Returns the executable and its version output.
+        '''
+        class capture(object):
+            def __init__(self):
+                self.lines = []
+
             def write(self, message):
-                pass
+                self.lines.append(message)
+        probe = {
+            'toolset': self.b2_toolset,
+            'toolset_version': self.b2_toolset_version,
+            'exec': "$(DEFAULT)",
+            'version': None}
         if bool(
             (self.b2_os in [
                 'linux', 'freebsd', 'solaris', 'darwin', 'android']) or
             (self.b2_os == 'windows' and self.b2_toolset == 'gcc')
         ):
+            candidates = []
             if 'CXX' in os.environ:
-                try:
-                    self.run(
-                        os.environ['CXX'] + ' --version',
-                        output=dev_null())
-                    return os.environ['CXX']
-                except:
-                    pass
+                candidates.append(os.environ['CXX'])
             version = str(self.settings.compiler.version).split('.')
             result_x = self.b2_toolset.replace('gcc', 'g++') + "-" + version[0]
             result_xy = result_x
             if len(version) > 1:
                 result_xy += version[1] if version[1] != '0' else ''
-            try:
-                self.run(result_xy + " --version", output=dev_null())
-                return result_xy
-            except:
-                pass
-            try:
-                self.run(result_x + " --version", output=dev_null())
-                return result_x
-            except:
-                pass
-            return "$(DEFAULT)"
+            candidates += [result_xy, result_x]
+            for candidate in candidates:
+                output = capture()
+                try:
+                    self.run(candidate + " --version", output=output)
+                except:
+                    continue
+                probe['exec'] = candidate
+                probe['version'] = "".join(output.lines).strip()
+                break
         elif self.b2_os == "windows":
-            return self.b2_win_cl_exe or "$(DEFAULT)"
-        else:
-            return "$(DEFAULT)"
+            probe['exec'] = self.b2_win_cl_exe or "$(DEFAULT)"
+        return probe
+
+    # The compiler to use with a compiler cache when we don't have a specific
+    # one.
+    _b2_default_compiler = {
+        'gcc': 'g++',
+        'clang': 'clang++'}
+
+    @property
+    def b2_compiler_launcher(self):
+        '''
+        The compiler cache, "ccache", "sccache", or the path to either, given
+        in `CONAN_BOOST_COMPILER_CACHE` to wrap the compiler with. "None" when
+        not given, or not usable with the toolset.
+        '''
+        launcher = os.getenv('CONAN_BOOST_COMPILER_CACHE')
+        if not launcher:
+            return None
+        if self.b2_toolset not in self._b2_default_compiler:
+            self.output.warn(
+                "Compiler cache is not supported for the %s toolset." % (
+                    self.b2_toolset))
+            return None
+        return launcher
+
+    @property
+    def b2_toolset_command(self):
+        '''
+        The B2 command to invoke the compiler with, which is the compiler
+        executable optionally prefixed by the compiler cache launcher.
+        '''
+        command = self.b2_toolset_exec
+        launcher = self.b2_compiler_launcher
+        if launcher:
+            if command == "$(DEFAULT)":
+                command = self._b2_default_compiler[self.b2_toolset]
+            return '"%s" "%s"' % (launcher.replace('\\', '/'), command)
+        return '"%s"' % (command)
 
     @property
     def b2_win_cl_exe(self):
@@ -1059,9 +2099,13 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
 
     @property
     def b2_fpic(self):
-        if self.b2_os != 'windows' and self.b2_toolset in ['gcc', 'clang'] \
-                and self.b2_link == 'static':
-            return '<flags>-fPIC\n<cxxflags>-fPIC'
+        if self.b2_os != 'windows' and self.b2_toolset in ['gcc', 'clang']:
+            if self._b2_multi_variants:
+                # Only the static ones of the variants built together.
+                return '<link>static:<flags>-fPIC\n' + \
+                    '<link>static:<cxxflags>-fPIC'
+            if self.b2_link == 'static':
+                return '<flags>-fPIC\n<cxxflags>-fPIC'
         return ''
 
     @property
@@ -1278,6 +2322,22 @@ alias boost_{lib} : {space_joined_libs} : : : $(usage) ;
             return subprocess.check_output(command, shell=False).strip()
 
 
+class BoostPackageView(object):
+    '''
+    The package data properties, of any package, that the mixins use to
+    decide if they match the package. Used to match the mixins for all the
+    packages without creating the packages.
+    '''
+
+    def __init__(self, data, name):
+        self.boost_name = name
+        self.boost_libs = data[name]['lib_short_names']
+        self.boost_header_only_libs = data[name]['header_only_libs']
+        self.boost_libs_to_build = list(
+            set(self.boost_libs)-set(self.boost_header_only_libs))
+        self.is_cycle_group = "cycle_group" in name
+
+
 class BoostConanMixin(object):
     '''
     This base mixin class provides for dynamic hooks into the packaging steps.
@@ -1318,6 +2378,14 @@ class BoostConanMixin(object):
     def boost_build_requires(self):
         return []
 
+    @property
+    def boost_source_dirs(self):
+        '''
+        Dictionary of library to extra source directories, beyond the
+        headers, to extract for that library.
+        '''
+        return {}
+
     def requirements(self):
         pass
 
@@ -1367,6 +2435,53 @@ class BoostConanMixin_Shared(BoostConanMixin):
 boost_conan_mixins.append(BoostConanMixin_Shared)
 
 
+class BoostConanMixin_CycleGroup(BoostConanMixin):
+    '''
+    Adds a `build_members` option to cycle groups to only build some of the
+    libraries in the group. It's "all", the default, or a comma separated
+    list of the libraries to build. Plus the libraries of the member packages
+    in the dependency graph, which ask for themselves with a `build_<lib>`
+    option of the group. Hence "needed" builds only the members in use.
+    '''
+
+    @property
+    def matches(self):
+        return self.conanfile.is_cycle_group and \
+            len(self.conanfile.boost_libs_to_build) > 0
+
+    @property
+    def options(self):
+        options = {'build_members': 'ANY'}
+        for lib in self.conanfile.boost_libs_to_build:
+            options['build_' + lib] = [True, False]
+        return options
+
+    @property
+    def default_options(self):
+        default_options = {'build_members': 'all'}
+        for lib in self.conanfile.boost_libs_to_build:
+            default_options['build_' + lib] = False
+        return default_options
+
+    def package_info(self):
+        # What we built, for the members to check they are in it.
+        self.conanfile.user_info.boost_built_libs = ",".join(
+            sorted(self.conanfile.boost_build_members))
+
+    def package_id(self):
+        # Only what gets built matters. Not how it was asked for.
+        built = sorted(self.conanfile.boost_build_members)
+        for lib in self.conanfile.boost_libs_to_build:
+            delattr(self.conanfile.info.options, 'build_' + lib)
+        if built == sorted(self.conanfile.boost_libs_to_build):
+            self.conanfile.info.options.build_members = 'all'
+        else:
+            self.conanfile.info.options.build_members = ",".join(built)
+
+
+boost_conan_mixins.append(BoostConanMixin_CycleGroup)
+
+
 class BoostConanMixin_UseICU(BoostConanMixin):
     '''
     This adds a `use_icu` option for packages where ICU can be used.
@@ -1681,6 +2796,10 @@ class BoostConanMixin_Predef(BoostConanMixin):
     def matches(self):
         return self.conanfile.boost_name == 'predef'
 
+    @property
+    def boost_source_dirs(self):
+        return {'predef': ['check', 'tools']}
+
     def package(self):
         for subdir in ("check", "tools"):
             src_dir = os.path.join('predef', subdir)
@@ -1768,6 +2887,10 @@ class BoostConanMixin_Config(BoostConanMixin):
     def matches(self):
         return self.conanfile.boost_name == 'config'
 
+    @property
+    def boost_source_dirs(self):
+        return {'config': ['checks']}
+
     def package(self):
         src_dir = os.path.join("config", "checks")
         self.conanfile.copy(
@@ -1917,3 +3040,531 @@ class BoostConanMixin_Timer(BoostConanMixin):
 
 
 boost_conan_mixins.append(BoostConanMixin_Timer)
+
+
+#
+# Utilities shared by the recipes and the scripts..
+#
+
+
+def boost_cache_dir(*paths):
+    '''
+    Location of the machine wide caches shared by all the Boost packages.
+    Defaults to "boost" in the Conan user home, and can be changed with the
+    `CONAN_BOOST_CACHE_DIR` environment variable.
+    '''
+    root = os.getenv('CONAN_BOOST_CACHE_DIR')
+    if not root:
+        root = os.path.join(
+            os.getenv('CONAN_USER_HOME', os.path.expanduser('~')),
+            '.conan', 'boost')
+    return os.path.join(root, *paths)
+
+
+# The thread locks of `boost_lock`, by lock file.
+boost_thread_locks = {}
+boost_thread_locks_lock = threading.Lock()
+
+
+@contextmanager
+def boost_lock(lock_file):
+    '''
+    Exclusive lock on the `lock_file` across processes, and across the
+    threads of this process. The inter-process file locks alone don't
+    exclude other threads, as the lock is held by the whole process.
+    '''
+    lock_file = os.path.abspath(lock_file)
+    with boost_thread_locks_lock:
+        thread_lock = boost_thread_locks.setdefault(
+            lock_file, threading.Lock())
+    with thread_lock:
+        with fasteners.InterProcessLock(lock_file):
+            yield
+
+
+def boost_telemetry(event):
+    '''
+    Appends the `event` dictionary as a JSON line to the file given by the
+    `CONAN_BOOST_TELEMETRY` environment variable. Events are tagged with the
+    `CONAN_BOOST_TELEMETRY_RUN` id, if any, to tell runs apart. Does nothing
+    when telemetry is not enabled.
+    '''
+    filename = os.getenv('CONAN_BOOST_TELEMETRY')
+    if not filename:
+        return
+    event = dict(event)
+    event.setdefault('time', time.time())
+    if os.getenv('CONAN_BOOST_TELEMETRY_RUN'):
+        event.setdefault('run', os.getenv('CONAN_BOOST_TELEMETRY_RUN'))
+    line = json.dumps(event, sort_keys=True) + "\n"
+    with boost_telemetry_lock:
+        with open(filename, 'a') as f:
+            f.write(line)
+
+
+boost_telemetry_lock = threading.Lock()
+
+
+def boost_link_file(src, dst, mode):
+    '''
+    Makes the `dst` file have the contents of the `src` file by the cheapest
+    means allowed by the `mode`. Which is "reflink", a copy on write clone,
+    "hardlink", or "1" to try both in that order. Falls back to copying, for
+    example when the files are on different file systems. Symbolic links are
+    recreated as such. Returns how the file was made, i.e. "reflink",
+    "hardlink", or "copy".
+    '''
+    if os.path.lexists(dst):
+        os.remove(dst)
+    tools.mkdir(os.path.dirname(dst))
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return 'copy'
+    if mode in ('1', 'reflink'):
+        try:
+            import fcntl
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                # The Linux FICLONE ioctl.
+                fcntl.ioctl(d.fileno(), 0x40049409, s.fileno())
+            shutil.copystat(src, dst)
+            return 'reflink'
+        except (ImportError, IOError, OSError):
+            if os.path.lexists(dst):
+                os.remove(dst)
+    if mode in ('1', 'hardlink'):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except (AttributeError, OSError):
+            pass
+    shutil.copy2(src, dst)
+    return 'copy'
+
+
+def boost_dedupe_files(store_dir, filenames):
+    '''
+    Replaces each of the files with a hard link to the same content in the
+    content addressed store in `store_dir`. Files not yet in the store get
+    copied to it. Returns the count of files, of those now linked to the
+    store, and of the bytes saved by the files that were already stored.
+    '''
+    stats = {'files': 0, 'linked': 0, 'saved': 0}
+    for filename in filenames:
+        if os.path.islink(filename) or not os.path.isfile(filename):
+            continue
+        stats['files'] += 1
+        digest = boost_file_sha256(filename)
+        blob = os.path.join(store_dir, digest[0:2], digest)
+        tmp = None
+        try:
+            if os.path.isfile(blob) and os.path.samefile(blob, filename):
+                stats['linked'] += 1
+                continue
+            stored = os.path.isfile(blob)
+            if not stored:
+                tools.mkdir(os.path.dirname(blob))
+                tmp = blob + '.%s' % (os.getpid())
+                shutil.copyfile(filename, tmp)
+                os.rename(tmp, blob)
+            tmp = filename + '.%s' % (os.getpid())
+            os.link(blob, tmp)
+            try:
+                os.rename(tmp, filename)
+            except OSError:
+                # Windows can't rename over an existing file.
+                os.remove(filename)
+                os.rename(tmp, filename)
+        except OSError:
+            # Can't link, for example across file systems or too many links,
+            # keep the copy.
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            continue
+        stats['linked'] += 1
+        if stored:
+            stats['saved'] += os.path.getsize(filename)
+    return stats
+
+
+def boost_file_sha256(filename):
+    '''
+    The hex sha256 digest of the contents of the given file.
+    '''
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def boost_merged_include_dir(include_dirs):
+    '''
+    A single include dir with the contents of all the `include_dirs`, as a
+    tree of symbolic links in the `includes` dir of the machine wide cache.
+    The tree is keyed by the include dirs, and the packages they are in, see
+    `boost_include_dir_signature`, and made only once. Unless any of its
+    links got broken, by removing a package, when it's made again. Headers
+    found in more than one of the include dirs come from the first, as with
+    the compiler search order. Returns `None` if the links can't be made, for
+    example on Windows without the privilege to create symbolic links.
+    '''
+    include_dirs = [
+        os.path.abspath(d) for d in include_dirs if os.path.isdir(d)]
+    key = hashlib.sha1("\n".join([
+        d + " " + boost_include_dir_signature(d) for d in include_dirs
+    ]).encode('utf-8')).hexdigest()[0:16]
+    merged_dir = boost_cache_dir('includes', key)
+    if os.path.isdir(merged_dir):
+        if not boost_broken_links(merged_dir):
+            return merged_dir
+        # Moved aside first, as renaming the new tree into place needs the
+        # name free.
+        stale = merged_dir + '.stale.' + str(os.getpid())
+        try:
+            os.rename(merged_dir, stale)
+            shutil.rmtree(stale, ignore_errors=True)
+        except OSError:
+            pass
+    try:
+        tools.mkdir(os.path.dirname(merged_dir))
+        # Made aside and renamed into place. So that concurrent builds never
+        # see a partial tree.
+        tmp = tempfile.mkdtemp(
+            prefix=key + '.', dir=os.path.dirname(merged_dir))
+        try:
+            boost_merge_dirs(tmp, include_dirs)
+            os.rename(tmp, merged_dir)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if os.path.isdir(merged_dir):
+                return merged_dir
+            raise
+    except (AttributeError, NotImplementedError, OSError):
+        return None
+    return merged_dir
+
+
+def boost_include_dir_signature(include_dir):
+    '''
+    What identifies the contents of the `include_dir`. The Conan manifest of
+    the package it's in, which changes each time the package is made. Or for
+    dirs not in a package their inode and modification time.
+    '''
+    parent = include_dir
+    for _ in range(3):
+        parent = os.path.dirname(parent)
+        manifest = os.path.join(parent, 'conanmanifest.txt')
+        if os.path.isfile(manifest):
+            return boost_file_sha256(manifest)
+    stat = os.stat(include_dir)
+    return "%s:%s" % (stat.st_ino, stat.st_mtime)
+
+
+def boost_broken_links(merged_dir):
+    '''
+    If any of the links in the `merged_dir` tree points to something that
+    no longer exists. Only the links are checked, not the dirs they point to.
+    '''
+    for root, dirs, files in os.walk(merged_dir):
+        for name in dirs + files:
+            path = os.path.join(root, name)
+            if os.path.islink(path) and not os.path.exists(path):
+                return True
+    return False
+
+
+def boost_merge_dirs(merged_dir, dirs):
+    '''
+    Fills the `merged_dir` with links to the entries of the `dirs`. An entry
+    only in one of the dirs is linked directly, even when it's a dir. Which
+    keeps the tree small as most of the Boost libraries have their own dirs.
+    Dirs in more than one get merged recursively.
+    '''
+    entries = {}
+    for d in dirs:
+        for name in os.listdir(d):
+            entries.setdefault(name, []).append(os.path.join(d, name))
+    for name, paths in entries.items():
+        merged_path = os.path.join(merged_dir, name)
+        subdirs = [p for p in paths if os.path.isdir(p)]
+        if len(subdirs) > 1 and os.path.isdir(paths[0]):
+            os.mkdir(merged_path)
+            boost_merge_dirs(merged_path, subdirs)
+        else:
+            os.symlink(paths[0], merged_path)
+
+
+def boost_merged_include_paths(deps_cpp_info):
+    '''
+    The include paths of the dependencies with the ones of the Boost packages
+    replaced by their merged include dir. The merged dir goes where the first
+    Boost include path was. If the dir can't be made the paths are returned
+    as they are.
+    '''
+    include_paths = []
+    boost_paths = []
+    boost_at = None
+    for dep in deps_cpp_info.deps:
+        for path in deps_cpp_info[dep].include_paths:
+            if not dep.startswith('boost_'):
+                include_paths.append(path)
+            elif path not in boost_paths:
+                if boost_at is None:
+                    boost_at = len(include_paths)
+                boost_paths.append(path)
+    if len(boost_paths) < 2:
+        return list(deps_cpp_info.include_paths)
+    merged_dir = boost_merged_include_dir(boost_paths)
+    if not merged_dir:
+        return list(deps_cpp_info.include_paths)
+    include_paths.insert(boost_at, merged_dir)
+    return include_paths
+
+
+class boost_merged_includes(Generator):
+    '''
+    Generator for consumers to compile with a single include dir for all the
+    Boost packages, instead of one per package. Writes
+    "conanbuildinfo_boost.cmake", to include after "conanbuildinfo.cmake" and
+    before calling `conan_basic_setup`, that replaces the `CONAN_INCLUDE_DIRS`
+    variables. And "conanbuildinfo_boost.txt" with the include dirs, one per
+    line, for other build systems.
+    '''
+
+    @property
+    def filename(self):
+        pass
+
+    @property
+    def content(self):
+        include_paths = [
+            p.replace('\\', '/')
+            for p in boost_merged_include_paths(self.deps_build_info)]
+        cmake = ['set(CONAN_INCLUDE_DIRS %s)' % (
+            ' '.join('"%s"' % (p) for p in include_paths))]
+        merged_root = boost_cache_dir('includes').replace('\\', '/') + '/'
+        merged_dirs = [p for p in include_paths if p.startswith(merged_root)]
+        if merged_dirs:
+            # The per package variables are used by the targets.
+            cmake.append(
+                'set(CONAN_BOOST_MERGED_INCLUDE_DIR "%s")' % (merged_dirs[0]))
+            for dep in self.deps_build_info.deps:
+                if dep.startswith('boost_'):
+                    cmake.append(
+                        'set(CONAN_INCLUDE_DIRS_%s '
+                        '"${CONAN_BOOST_MERGED_INCLUDE_DIR}")' % (
+                            dep.upper()))
+        return {
+            'conanbuildinfo_boost.cmake': "\n".join(cmake) + "\n",
+            'conanbuildinfo_boost.txt': "\n".join(include_paths) + "\n"}
+
+
+class BoostFrozenDict(dict):
+    '''
+    A dictionary that can't be changed after it's created.
+    '''
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("The Boost package data is read only.")
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def boost_freeze(value):
+    '''
+    Returns a read only copy of the given JSON `value`. I.e. with the
+    dictionaries and lists replaced with frozen dictionaries and tuples.
+    '''
+    if isinstance(value, dict):
+        return BoostFrozenDict([
+            (k, boost_freeze(v)) for k, v in value.items()])
+    if isinstance(value, list):
+        return tuple([boost_freeze(v) for v in value])
+    return value
+
+
+class BoostJamTemplate(object):
+    '''
+    A text template with `{{{name}}}` placeholders. Templates are parsed once
+    per process, from a file, into alternating literal text and placeholder
+    segments.
+    '''
+
+    placeholder_re = re.compile(r'{{{([^{}]+)}}}')
+    templates = {}
+
+    @classmethod
+    def load(cls, filename):
+        if filename not in cls.templates:
+            cls.templates[filename] = cls(load(filename))
+        return cls.templates[filename]
+
+    def __init__(self, text):
+        # The even segments are literal text, the odd ones placeholder names.
+        self.segments = self.placeholder_re.split(text)
+        self.placeholders = set(self.segments[1::2])
+
+    def render(self, values):
+        '''
+        Fills in the placeholders from the `values` dictionary of functions.
+        Each placeholder function is called once, and only if the placeholder
+        is in the template. Fails if there is no function for a placeholder.
+        '''
+        unknown = self.placeholders - set(values.keys())
+        if unknown:
+            raise Exception("Unknown template placeholders: %s" % (
+                ", ".join(sorted(unknown))))
+        resolved = dict([(name, values[name]()) for name in self.placeholders])
+        segments = list(self.segments)
+        for i in range(1, len(segments), 2):
+            segments[i] = resolved[segments[i]]
+        return "".join(segments)
+
+
+class BoostSourceCache(object):
+    '''
+    Content addressed store of downloaded source files. Files are stored by
+    their sha256 digest in `blobs`, and are found from a `(repo, tag, name)`
+    key through the `index`, which also has the size of the file. All
+    changes happen under locks, across processes and threads, so that
+    concurrent package builds share downloads instead of repeating them.
+    When the cache grows over `max_size` bytes the least recently used files
+    are evicted.
+    '''
+
+    # Files used within this many seconds are never evicted, as they may
+    # still be in use by a concurrent package build.
+    min_age = 60 * 60
+
+    def __init__(self, root, max_size=0):
+        self.root = root
+        self.max_size = max_size
+        self.downloaded = 0
+
+    def fetch(self, key, url, download):
+        '''
+        Returns the path to the cached file for the `key`. On a miss the file
+        is obtained by calling `download(url, filename)`. Downloaded archives
+        are read through before storing them, so that truncated or corrupt
+        ones, like error pages, never get into the cache.
+        '''
+        index_file = os.path.join(self.root, 'index', *key)
+        with self._lock('index-' + '-'.join(key)):
+            blob = self._lookup(index_file)
+            if not blob:
+                tools.mkdir(os.path.join(self.root, 'tmp'))
+                tmp_dir = tempfile.mkdtemp(dir=os.path.join(self.root, 'tmp'))
+                try:
+                    filename = os.path.join(tmp_dir, key[-1])
+                    download(url, filename)
+                    self.downloaded += os.path.getsize(filename)
+                    self.verify(filename)
+                    blob = self.add(filename)
+                finally:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                self._save_index(index_file, blob)
+        self.evict()
+        return blob
+
+    def remove(self, key):
+        '''
+        Removes the cached file for the `key`, if any. For when it turns out
+        to be bad, to download it again.
+        '''
+        index_file = os.path.join(self.root, 'index', *key)
+        with self._lock('index-' + '-'.join(key)):
+            if os.path.isfile(index_file):
+                blob = self._blob_path(load(index_file).split()[0])
+                os.remove(index_file)
+                if os.path.isfile(blob):
+                    os.remove(blob)
+
+    @classmethod
+    def verify(cls, filename):
+        '''
+        Reads through the whole of a tar archive, which fails when it's
+        truncated or not an archive at all. Other files are not checked.
+        '''
+        if re.search(r'[.]tar([.].*)?$|[.]tgz$', filename):
+            with tarfile.open(filename, 'r|*') as tar:
+                for _ in tar:
+                    pass
+
+    def add(self, filename):
+        '''
+        Moves the given file into the store and returns the stored path.
+        Different keys can have the same file, so it's locked by the digest.
+        '''
+        digest = boost_file_sha256(filename)
+        blob = self._blob_path(digest)
+        tools.mkdir(os.path.dirname(blob))
+        with self._lock('blob-' + digest):
+            if os.path.exists(blob):
+                os.remove(filename)
+            else:
+                os.rename(filename, blob)
+        return blob
+
+    def evict(self):
+        '''
+        Removes the least recently used files until the cache fits in
+        `max_size`. A `max_size` of zero means no limit.
+        '''
+        if not self.max_size:
+            return
+        with self._lock('evict'):
+            blobs = []
+            for root, _, files in os.walk(os.path.join(self.root, 'blobs')):
+                for name in files:
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    blobs.append((stat.st_mtime, stat.st_size, path))
+            size = sum([blob[1] for blob in blobs])
+            now = time.time()
+            for mtime, blob_size, path in sorted(blobs):
+                if size <= self.max_size or now - mtime < self.min_age:
+                    break
+                os.remove(path)
+                size -= blob_size
+
+    def _lookup(self, index_file):
+        '''
+        Finds, and checks, the stored file for an index entry. Files are only
+        hashed when stored, after that their size is checked against the
+        one in the index. The modification time can't be, as it marks the
+        use of the file for the eviction. Entries without a size are hashed
+        once, and get the size. Files that fail the check are removed.
+        Returns "None" on a miss.
+        '''
+        if not os.path.isfile(index_file):
+            return None
+        entry = load(index_file).split()
+        blob = self._blob_path(entry[0])
+        if not os.path.isfile(blob):
+            return None
+        if len(entry) > 1:
+            valid = os.path.getsize(blob) == int(entry[1])
+        else:
+            valid = boost_file_sha256(blob) == entry[0]
+            if valid:
+                self._save_index(index_file, blob)
+        if not valid:
+            os.remove(blob)
+            return None
+        # Mark as recently used for the eviction.
+        os.utime(blob, None)
+        return blob
+
+    def _save_index(self, index_file, blob):
+        save(index_file, "%s %s" % (
+            os.path.basename(blob), os.path.getsize(blob)))
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[0:2], digest)
+
+    def _lock(self, name):
+        tools.mkdir(os.path.join(self.root, 'locks'))
+        return boost_lock(os.path.join(
+            self.root, 'locks',
+            hashlib.sha1(name.encode('utf-8')).hexdigest() + '.lock'))
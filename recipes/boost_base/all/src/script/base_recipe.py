@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import importlib.util
+import os.path
+import threading
+
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+base_dir = os.path.dirname(os.path.dirname(script_dir))
+
+_module = None
+_module_lock = threading.Lock()
+
+
+def load():
+    '''
+    The `boost_base` recipe, i.e. its `conanfile.py`, as a module. For the
+    scripts to use the same utilities as the recipes, like the caches and
+    telemetry. Loaded once.
+    '''
+    global _module
+    with _module_lock:
+        if _module is None:
+            spec = importlib.util.spec_from_file_location(
+                'boost_base_conanfile', os.path.join(base_dir, 'conanfile.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _module = module
+    return _module
+
+
+def telemetry(event):
+    '''
+    Records the `event` to the `CONAN_BOOST_TELEMETRY` event stream, like
+    the recipes do. Only loads the recipe when telemetry is enabled.
+    '''
+    if os.getenv('CONAN_BOOST_TELEMETRY'):
+        load().boost_telemetry(event)
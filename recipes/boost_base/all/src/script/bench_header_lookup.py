@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import glob
+import os.path
+import shutil
+import subprocess
+import tempfile
+import time
+import timeit
+from bls.util import Main
+import base_recipe
+
+
+class BenchHeaderLookup(Main):
+    '''
+    Measures the cost of finding the Boost headers with one include dir per
+    package, as the Conan generators give them, compared to the single
+    merged include dir of `CONAN_BOOST_MERGED_INCLUDES=1` and the
+    `boost_merged_includes` generator. Uses the packages in the Conan cache.
+    '''
+
+    def __init_parser__(self, parser):
+        parser.add_argument(
+            '++conan-data',
+            help='The Conan packages data dir.'+
+                ' Default is "<conan-user-home>/.conan/data".',
+            default=os.path.join(
+                os.getenv('CONAN_USER_HOME', os.path.expanduser('~')),
+                '.conan', 'data'))
+        parser.add_argument(
+            '++version',
+            help='The Boost version of the packages. Default is any.',
+            default='*')
+        parser.add_argument(
+            '++headers',
+            help='How many of the top level headers to include.'+
+                ' Default is 200.',
+            type=int,
+            default=200)
+        parser.add_argument(
+            '++iterations',
+            help='How many times to repeat each lookup. Default is 5.',
+            type=int,
+            default=5)
+        parser.add_argument(
+            '++cxx',
+            help='The compiler to time preprocessing with. Default is the'+
+                ' "CXX" environment variable, or "c++".',
+            default=os.getenv('CXX', 'c++'))
+
+    def __run__(self):
+        conanfile = base_recipe.load()
+
+        # One include dir per package, i.e. from the first binary package of
+        # "<name>/<version>/<user>/<channel>/package/<id>/<lib>/include".
+        include_dirs = {}
+        for include_dir in sorted(glob.glob(os.path.join(
+                self.args.conan_data, 'boost_*', self.args.version, '*', '*',
+                'package', '*', '*', 'include'))):
+            name = os.path.relpath(
+                include_dir, self.args.conan_data).split(os.sep)[0]
+            include_dirs.setdefault(name, include_dir)
+        include_dirs = [include_dirs[n] for n in sorted(include_dirs.keys())]
+        if len(include_dirs) < 2:
+            raise Exception(
+                "Need the packages of at least two Boost libraries in %s." % (
+                    self.args.conan_data))
+        start = time.time()
+        merged_dir = conanfile.boost_merged_include_dir(include_dirs)
+        if not merged_dir:
+            raise Exception("Can't make the merged include dir here.")
+        print('Merged %s include dirs into %s, in %.3fs' % (
+            len(include_dirs), merged_dir, time.time() - start))
+
+        headers = set()
+        for include_dir in include_dirs:
+            for header in glob.glob(os.path.join(include_dir, 'boost', '*')):
+                if os.path.isfile(header):
+                    headers.add('boost/' + os.path.basename(header))
+        headers = sorted(headers)[0:self.args.headers]
+        print('Headers: %s' % (len(headers)))
+
+        for label, dirs in [
+                ('per-package', include_dirs), ('merged', [merged_dir])]:
+            probes = [0]
+
+            def lookup():
+                # The search the preprocessor does for each include.
+                for header in headers:
+                    for d in dirs:
+                        probes[0] += 1
+                        if os.path.isfile(os.path.join(d, header)):
+                            break
+
+            seconds = timeit.timeit(lookup, number=self.args.iterations)
+            print('  %-12s %3s dirs, %8.1f probes/header, %8.1f us/header' % (
+                label, len(dirs),
+                probes[0] / float(len(headers) * self.args.iterations),
+                seconds * 1000000.0 / (len(headers) * self.args.iterations)))
+
+        if not shutil.which(self.args.cxx):
+            print('No "%s" compiler to time preprocessing with.' % (
+                self.args.cxx))
+            return
+        source_dir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(source_dir, 'headers.cpp')
+            with open(source, 'w') as f:
+                for header in headers:
+                    f.write('#include <%s>\n' % (header))
+            for label, dirs in [
+                    ('per-package', include_dirs), ('merged', [merged_dir])]:
+                command = [self.args.cxx, '-E', '-o', os.devnull]
+                command += ['-I' + d for d in dirs]
+                command += [source]
+                best = None
+                for _ in range(self.args.iterations):
+                    start = time.time()
+                    result = subprocess.run(
+                        command, stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+                    seconds = time.time() - start
+                    best = seconds if best is None else min(best, seconds)
+                print('  %-12s %3s dirs, %8.3fs to preprocess%s' % (
+                    label, len(dirs), best,
+                    '' if result.returncode == 0 else ' (with errors)'))
+        finally:
+            shutil.rmtree(source_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    BenchHeaderLookup()
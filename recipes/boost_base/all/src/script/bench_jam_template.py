@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import os.path
+import re
+import timeit
+from bls.util import Main
+import base_recipe
+
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+base_dir = os.path.dirname(os.path.dirname(script_dir))
+
+
+class BenchJamTemplate(Main):
+    '''
+    Measures the cost of rendering the jam templates, per package, with the
+    `BoostJamTemplate` of the base recipe compared to replacing each
+    placeholder in turn.
+    '''
+
+    def __init_parser__(self, parser):
+        parser.add_argument(
+            '++iterations',
+            help='How many times to render each template. Default is 1000.',
+            type=int,
+            default=1000)
+
+    def __run__(self):
+        conanfile = base_recipe.load()
+        template_dir = os.path.join(base_dir, 'src', 'template')
+        for name in sorted(os.listdir(template_dir)):
+            filename = os.path.join(template_dir, name)
+            with open(filename) as f:
+                text = f.read()
+            placeholders = sorted(set(re.findall(r'{{{([^{}]+)}}}', text)))
+            # Fixed values, so that we only measure the rendering.
+            values = dict([
+                (placeholder, lambda: '"value"')
+                for placeholder in placeholders])
+
+            def replace():
+                content = text
+                for placeholder in placeholders:
+                    content = content.replace(
+                        '{{{' + placeholder + '}}}', values[placeholder]())
+                return content
+
+            def render():
+                return conanfile.BoostJamTemplate.load(filename).render(
+                    values)
+
+            if replace() != render():
+                raise Exception("Rendered %s differs." % (name))
+            print('%s: %s bytes, %s placeholders' % (
+                name, len(text), len(placeholders)))
+            for label, function in [('replace', replace), ('render', render)]:
+                seconds = timeit.timeit(function, number=self.args.iterations)
+                print('  %-8s %8.1f us/render' % (
+                    label, seconds * 1000000.0 / self.args.iterations))
+
+
+if __name__ == "__main__":
+    BenchJamTemplate()
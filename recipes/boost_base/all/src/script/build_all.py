@@ -25,9 +25,13 @@ class BuildAll(ForEach):
     Calls CPT for all the Boost packages possible. This runs both
     outside and inside a Docker container. When specifying with the
     ++package option it runs for that one package inside the container.
-    Otherwise it runs for all packages outside the container.
+    Otherwise it runs for all packages outside the container. With more
+    than one ++jobs each package is built in a ++package sub-process, as
+    CPT changes the process current directory and environment.
     '''
 
+    package_do_concurrent = True
+
     def __init_parser__(self, parser):
         super(BuildAll, self).__init_parser__(parser)
         parser.add_argument(
@@ -37,6 +41,29 @@ class BuildAll(ForEach):
         parser.add_argument(
             '++package',
             help='The single package to build.')
+        parser.add_argument(
+            '++prefetch',
+            help='Download the sources of all the packages in the background.',
+            action='store_true')
+
+    def __run__(self):
+        if self.args.package:
+            # Only build the one package, the data dir was already set up by
+            # the parent process.
+            self.conan_env = self.__conan_env__()
+            self.package_build(self.args.package)
+        else:
+            super(BuildAll, self).__run__()
+
+    def __conan_env__(self):
+        conan_env = {}
+        if 'CONAN_DOCKER_IMAGE' in os.environ:
+            conan_env['CONAN_USE_DOCKER'] = '1'
+        if tools.os_info.is_linux:
+            conan_data_dir = os.path.join(root_dir, ".conan_data")
+            conan_env["CONAN_DOCKER_RUN_OPTIONS"] \
+                = "-v {}:/home/conan/.conan/data".format(conan_data_dir)
+        return conan_env
 
     def groups_pre(self, groups):
         # if not self.args.package:
@@ -47,20 +74,34 @@ class BuildAll(ForEach):
         #     "conan", "remote", "add", "bincrafters",
         #     "https://api.bintray.com/conan/bincrafters/public-conan",
         # ])
-        self.conan_env = {}
-        if 'CONAN_DOCKER_IMAGE' in os.environ:
-            self.conan_env['CONAN_USE_DOCKER'] = '1'
+        self.conan_env = self.__conan_env__()
         if tools.os_info.is_linux:
             conan_data_dir = os.path.join(root_dir, ".conan_data")
             tools.rmdir(conan_data_dir)
             tools.mkdir(conan_data_dir)
             self.__check_call__(['chmod', 'a+w', conan_data_dir])
-            self.conan_env["CONAN_DOCKER_RUN_OPTIONS"] \
-                = "-v {}:/home/conan/.conan/data".format(conan_data_dir)
+        if self.args.prefetch:
+            self.prefetch_start()
         super(BuildAll, self).groups_pre(groups)
 
+    def groups_post(self, groups):
+        super(BuildAll, self).groups_post(groups)
+        self.prefetch_wait()
+
     def package_do(self, package):
         super(BuildAll, self).package_do(package)
+        if self.args.jobs > 1:
+            self.package_check_call([
+                sys.executable, os.path.realpath(__file__),
+                '++version=%s' % (self.args.version),
+                '++base-version=%s' % (self.args.base_version),
+                '++recipes-dir=%s' % (self.args.recipes_dir),
+                '++package=%s' % (package)
+            ], cwd=self.args.recipes_dir)
+        else:
+            self.package_build(package)
+
+    def package_build(self, package):
         package_name = 'boost_'+package
         print('>>>>>>>>>>')
         print('>>>>>>>>>> '+package_name)
@@ -8,7 +8,6 @@
 import os.path
 import sys
 from pprint import pprint
-from bls.util import PushDir
 from foreach import ForEach
 
 
@@ -22,6 +21,8 @@ class CreateAll(ForEach):
     Creates, i.e. "conan create", all the Boos packages possible.
     '''
 
+    package_do_concurrent = True
+
     def __init_parser__(self, parser):
         super(CreateAll, self).__init_parser__(parser)
         parser.add_argument(
@@ -36,6 +37,10 @@ class CreateAll(ForEach):
             '++channel',
             help='The channel to create packages in.',
             required=True)
+        parser.add_argument(
+            '++prefetch',
+            help='Download the sources of all the packages in the background.',
+            action='store_true')
         parser.add_argument(
             'create',
             help='Arguments to pass to the "conan create" invocations.',
@@ -50,8 +55,14 @@ class CreateAll(ForEach):
             "conan", "remote", "add", "bincrafters",
             "https://api.bintray.com/conan/bincrafters/public-conan",
         ])
+        if self.args.prefetch:
+            self.prefetch_start()
         super(CreateAll, self).groups_pre(groups)
 
+    def groups_post(self, groups):
+        super(CreateAll, self).groups_post(groups)
+        self.prefetch_wait()
+
     def package_do(self, package):
         super(CreateAll, self).package_do(package)
         print('>>>>>>>>>>')
@@ -68,13 +79,25 @@ class CreateAll(ForEach):
             package_dir = os.path.join(
                 recipes_dir, package_name, 'all')
         if os.path.isdir(package_dir):
-            with PushDir(package_dir) as _:
-                self.__check_call__([
-                    'conan', 'create', '.', '%s/%s@%s/%s' % (
-                        package_name, package_version,
-                        self.args.user, self.args.channel),
+            package_ref = '%s/%s@%s/%s' % (
+                package_name, package_version,
+                self.args.user, self.args.channel)
+            test_dir = os.path.join(package_dir, 'test_package')
+            # With telemetry we run the test_package separately to tell
+            # apart how long it takes.
+            split_test = os.getenv('CONAN_BOOST_TELEMETRY') and \
+                os.path.isdir(test_dir)
+            with self.package_phase(package, 'create'):
+                self.package_check_call([
+                    'conan', 'create', '.', package_ref,
                     "--build=missing"
-                ]+self.args.create)
+                ]+(['--test-folder=None'] if split_test else [])
+                    + self.args.create, cwd=package_dir)
+            if split_test:
+                with self.package_phase(package, 'test'):
+                    self.package_check_call([
+                        'conan', 'test', test_dir, package_ref
+                    ]+self.args.create, cwd=package_dir)
 
 
 if __name__ == "__main__":
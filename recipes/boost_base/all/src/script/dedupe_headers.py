@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import glob
+import os.path
+from bls.util import Main
+import base_recipe
+
+
+class DedupeHeaders(Main):
+    '''
+    Replaces the headers of the Boost packages already in the Conan cache
+    with links to the machine wide header store. The same as what the
+    recipes do for new packages with `CONAN_BOOST_HEADER_STORE=1`.
+    '''
+
+    def __init_parser__(self, parser):
+        parser.add_argument(
+            '++conan-data',
+            help='The Conan packages data dir.'+
+                ' Default is "<conan-user-home>/.conan/data".',
+            default=os.path.join(
+                os.getenv('CONAN_USER_HOME', os.path.expanduser('~')),
+                '.conan', 'data'))
+        parser.add_argument(
+            '++store',
+            help='The header store dir.'+
+                ' Default is the "headers" dir of the Boost cache.')
+        parser.add_argument(
+            '++prune',
+            help='Remove the stored headers no package links to.',
+            action='store_true')
+
+    def __run__(self):
+        conanfile = base_recipe.load()
+        store_dir = self.args.store or conanfile.boost_cache_dir('headers')
+
+        # All the binary packages of the Boost libraries, i.e.
+        # "<name>/<version>/<user>/<channel>/package/<id>/<lib>/include".
+        include_dirs = glob.glob(os.path.join(
+            self.args.conan_data, 'boost_*', '*', '*', '*', 'package', '*',
+            '*', 'include'))
+        total = {'files': 0, 'linked': 0, 'saved': 0}
+        for include_dir in sorted(include_dirs):
+            headers = []
+            for dirpath, _, files in os.walk(include_dir):
+                headers.extend([os.path.join(dirpath, f) for f in files])
+            stats = conanfile.boost_dedupe_files(store_dir, headers)
+            for key in total.keys():
+                total[key] += stats[key]
+            if stats['saved'] > 0:
+                print('%s: saved %s bytes' % (include_dir, stats['saved']))
+        print('Linked %s of %s headers, in %s include dirs, saving %s '
+              'bytes.' % (
+                  total['linked'], total['files'], len(include_dirs),
+                  total['saved']))
+
+        # The store itself. Stored headers that have a single link are not
+        # used by any package. Otherwise all but one of the package copies
+        # are saved.
+        stored = {
+            'files': 0, 'bytes': 0, 'saved': 0, 'unused': 0, 'unused_bytes': 0}
+        for blob in glob.glob(os.path.join(store_dir, '*', '*')):
+            stat = os.stat(blob)
+            stored['files'] += 1
+            stored['bytes'] += stat.st_size
+            stored['saved'] += stat.st_size * max(0, stat.st_nlink - 2)
+            if stat.st_nlink == 1:
+                stored['unused'] += 1
+                stored['unused_bytes'] += stat.st_size
+                if self.args.prune:
+                    os.remove(blob)
+        print('Store has %s headers, %s bytes, saving %s bytes overall. Of '
+              'those %s, %s bytes, are unused%s.' % (
+                  stored['files'], stored['bytes'], stored['saved'],
+                  stored['unused'],
+                  stored['unused_bytes'],
+                  ' and were removed' if self.args.prune else ''))
+
+
+if __name__ == "__main__":
+    DedupeHeaders()
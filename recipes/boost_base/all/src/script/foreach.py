@@ -5,12 +5,18 @@
     Boost Software License, Version 1.0. (See accompanying file
     LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
 """
+import json
 import os.path
+import subprocess
 import sys
-from pprint import pprint
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from bls.git_tool import Git
 from bls.util import Main, PushDir
 from bls.lib_data import LibraryData
+from package_index import PackageIndex
+import base_recipe
 
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -24,6 +30,15 @@ class ForEach(Main):
     packages in correct dependency order.
     '''
 
+    # Subclasses set this when their `package_do` can be called concurrently
+    # for different packages. I.e. it doesn't change process wide state, like
+    # the current directory or environment.
+    package_do_concurrent = False
+
+    # Subclasses unset this when the time taken by their `package_do` is not
+    # the time to build the package. I.e. not to record it in the cost table.
+    package_costs_recorded = True
+
     def __init_parser__(self, parser):
         parser.add_argument(
             '++version',
@@ -34,6 +49,15 @@ class ForEach(Main):
             help='The directory of where to place the resulting recipes.'+
                 ' Default is "<cci>/recipes".',
             default=recipes_dir)
+        parser.add_argument(
+            '++jobs',
+            help='How many packages to process concurrently. Default is 1.',
+            type=int,
+            default=1)
+        parser.add_argument(
+            '++costs',
+            help='The file to read and record the package build times.'+
+                ' Default is "<conan>/boost/package-costs-<version>.json".')
 
     def __run__(self):
         label = None
@@ -46,49 +70,44 @@ class ForEach(Main):
         data_dir = os.path.realpath(os.path.join(
             os.path.dirname(script_dir), '..', 'src', 'data'))
         data_file = os.path.join(data_dir, 'package-data-%s.json' % (label))
+        self.label = label
 
         # Generate the build DAG..
 
-        self.package_data = self.__load_data__(data_file)
-
-        # Build simple dependency data.
-        package_deps = {}
-        # Add the "bootstrap" core dependencies.
-        # package_deps['build'] = set()
-        # package_deps['base'] = set(['build'])
-        package_deps['base'] = set()
-        #
-        for lib, info in self.package_data.items():
-            # All packages depend on the base.
-            lib_deps = set(['base'])
-            # Add regular and build only deps.
-            lib_deps |= set(info['b2_requires'])
-            lib_deps |= set(info['source_only_deps'])
-            # Record the deps.
-            package_deps[lib] = lib_deps
-
-        # Generate build groups in DAG order by decimating the deps graph.
-        groups = []
-        while len(package_deps) > 0:
-            # Each group contains all the packages that have no deps.
-            group = set()
-            for package, deps in package_deps.items():
-                if len(deps) == 0:
-                    group.add(package)
-            groups.append(group)
+        self.package_index = PackageIndex.open(data_file)
+
+        # Build simple dependency data, of the regular and build only deps.
+        # Add the "bootstrap" core dependencies. All packages depend on the
+        # base.
+        self.package_deps = {'base': set()}
+        for package in self.package_index.packages():
+            self.package_deps[package] = \
+                set(['base']) | self.package_index.requires(package)
+
+        # The build groups in DAG order are the levels of the packages.
+        groups = [set(['base'])] + self.package_index.levels()
+        for group in groups:
             print(">>>> GROUP: %s" % (group))
-            if len(group) == 0:
-                pprint(package_deps)
-                exit(1)
-            # We now remove the group members as they are accounted for.
-            for package in group:
-                del package_deps[package]
-            # Decimate the graph to remove this group.
-            for package in package_deps.keys():
-                package_deps[package] -= group
         sys.stdout.flush()
 
         os.environ['CONAN_VERBOSE_TRACEBACK'] = '1'
+        # Tag all the telemetry events, including the ones from the recipes,
+        # as coming from this run.
+        if os.getenv('CONAN_BOOST_TELEMETRY') and \
+                not os.getenv('CONAN_BOOST_TELEMETRY_RUN'):
+            os.environ['CONAN_BOOST_TELEMETRY_RUN'] = '%s-%s' % (
+                time.strftime('%Y%m%dT%H%M%S'), os.getpid())
+
+        # Prioritize the packages by their longest path to the end.
+        self.package_costs = self.__load_costs__()
+        self.package_times = {}
+        self.package_priority = {}
+        for group in reversed(groups):
+            for package in group:
+                self.package_priority[package] = \
+                    self.package_costs[package] + max([0.0] + [
+                        self.package_priority[dependent]
+                        for dependent in self.package_dependents(package)])
 
         # We can now go through the groups in the DAG order.
         self.foreach(groups)
@@ -99,9 +118,115 @@ class ForEach(Main):
         # process.
         with PushDir(self.args.recipes_dir) as _:
             self.groups_pre(groups)
-            self.groups_foreach(groups)
+            try:
+                self.groups_foreach(groups)
+            except BaseException:
+                # Don't leave the background downloads running after us.
+                self.prefetch_stop()
+                raise
+            finally:
+                if self.package_costs_recorded:
+                    self.__save_costs__()
+                    self.print_critical_path()
             self.groups_post(groups)
 
+    def __costs_file__(self):
+        if self.args.costs:
+            return self.args.costs
+        cache_dir = os.getenv('CONAN_BOOST_CACHE_DIR')
+        if not cache_dir:
+            cache_dir = os.path.join(
+                os.getenv('CONAN_USER_HOME', os.path.expanduser('~')),
+                '.conan', 'boost')
+        return os.path.join(cache_dir, 'package-costs-%s.json' % (self.label))
+
+    def __load_costs__(self):
+        '''
+        The estimated time, in seconds, to process each package. This is the
+        recorded time from previous runs, or a guess from the package data.
+        '''
+        recorded = {}
+        if os.path.isfile(self.__costs_file__()):
+            recorded = self.__load_data__(self.__costs_file__())
+        costs = {}
+        for package in self.package_deps.keys():
+            if package in recorded:
+                costs[package] = float(recorded[package])
+            else:
+                costs[package] = self.package_cost_estimate(package)
+        return costs
+
+    def __save_costs__(self):
+        if len(self.package_times) == 0:
+            return
+        costs_file = self.__costs_file__()
+        costs = {}
+        if os.path.isfile(costs_file):
+            costs = self.__load_data__(costs_file)
+        for package, (start, end) in self.package_times.items():
+            costs[package] = round(end - start, 3)
+        if not os.path.isdir(os.path.dirname(costs_file)):
+            os.makedirs(os.path.dirname(costs_file))
+        with open(costs_file, 'w') as f:
+            json.dump(costs, f, indent=1, sort_keys=True)
+
+    def package_cost_estimate(self, package):
+        '''
+        Guess of the time, in seconds, to process a package that has no
+        recorded time. Libraries that need building take much longer than
+        header only ones.
+        '''
+        if package not in self.package_deps or package == 'base':
+            return 10.0
+        return 10.0 + 120.0 * len(self.package_index.built_libs(package))
+
+    def package_dependents(self, package):
+        '''
+        The packages that directly depend on the `package`.
+        '''
+        if package == 'base':
+            return set(self.package_index.packages())
+        return self.package_index.dependents(package)
+
+    def print_critical_path(self):
+        '''
+        Prints the predicted critical path, i.e. the chain of packages with the
+        longest total cost. And the actual one, i.e. the chain of packages that
+        ended last, each one waiting on the previous one to finish.
+        '''
+        if len(self.package_times) == 0:
+            return
+        path = []
+        package = max(
+            self.package_priority.keys(),
+            key=lambda p: self.package_priority[p])
+        while package:
+            path.append(package)
+            package = max(
+                list(self.package_dependents(package)) or [None],
+                key=lambda p: self.package_priority.get(p, 0.0))
+        print(">>>> PREDICTED CRITICAL PATH: %.0fs" % (
+            self.package_priority[path[0]]))
+        for package in path:
+            print(">>>>   %s: %.0fs" % (package, self.package_costs[package]))
+        path = []
+        package = max(
+            self.package_times.keys(), key=lambda p: self.package_times[p][1])
+        while package:
+            path.append(package)
+            package = max(
+                [d for d in self.package_deps[package]
+                    if d in self.package_times] or [None],
+                key=lambda p: self.package_times.get(p, (0.0, 0.0))[1])
+        path.reverse()
+        print(">>>> ACTUAL CRITICAL PATH: %.0fs" % (
+            self.package_times[path[-1]][1] -
+            min([start for start, _ in self.package_times.values()])))
+        for package in path:
+            start, end = self.package_times[package]
+            print(">>>>   %s: %.0fs" % (package, end - start))
+        sys.stdout.flush()
+
     def groups_pre(self, groups):
         '''
         Called before processing all the groups. It calls `group_pre` for each
@@ -113,11 +238,60 @@ class ForEach(Main):
     def groups_foreach(self, groups):
         '''
         Called to process all the groups. It calls `group_foreach` for each
-        group in DAG order.
+        group in DAG order. Or, when asked for more than one job, calls
+        `dag_foreach` to process packages concurrently.
         '''
+        if self.args.jobs > 1 and not self.package_do_concurrent:
+            print(">>>> Can't process packages concurrently, using one job.")
+        elif self.args.jobs > 1:
+            self.dag_foreach(groups)
+            return
         for group in groups:
             self.group_foreach(group)
 
+    def dag_foreach(self, groups):
+        '''
+        Called to process all the packages in the groups with up to `++jobs`
+        concurrent calls to `package_do`. A package is started as soon as all
+        its dependencies are done, irrespective of what group it's in. After
+        the first failure no more packages are started, and the failure is
+        raised once the running packages are done.
+        '''
+        packages = set().union(*groups)
+        # The not yet done dependencies of each package, and the reverse.
+        waiting = {}
+        dependents = {}
+        for package in packages:
+            waiting[package] = self.package_deps[package] & packages
+            for dep in waiting[package]:
+                dependents.setdefault(dep, set()).add(package)
+        ready = self.package_order([
+            package for package, deps in waiting.items() if len(deps) == 0])
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            while len(running) > 0 or (len(ready) > 0 and not error):
+                while len(ready) > 0 and not error \
+                        and len(running) < self.args.jobs:
+                    package = ready.pop(0)
+                    running[executor.submit(self.package_run, package)] \
+                        = package
+                done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    package = running.pop(future)
+                    if future.exception():
+                        print(">>>> FAILED: %s" % (package))
+                        sys.stdout.flush()
+                        error = error or future.exception()
+                        continue
+                    for dependent in dependents.get(package, []):
+                        waiting[dependent].discard(package)
+                        if len(waiting[dependent]) == 0:
+                            ready.append(dependent)
+                    ready = self.package_order(ready)
+        if error:
+            raise error
+
     def groups_post(self, groups):
         '''
         Called after processing all the groups. It calls `group_post` for each
@@ -137,10 +311,10 @@ class ForEach(Main):
     def group_foreach(self, group):
         '''
         Called to process all the packages in a group. It calls `package_do`
-        for each package in an arbitrary order.
+        for each package, the ones on the longest path first.
         '''
-        for package in group:
-            self.package_do(package)
+        for package in self.package_order(group):
+            self.package_run(package)
 
     def group_post(self, group):
         '''
@@ -150,6 +324,41 @@ class ForEach(Main):
         for package in group:
             self.package_post(package)
 
+    def package_order(self, packages):
+        '''
+        Sorts the packages by priority, the ones with the longest path of
+        remaining work first.
+        '''
+        return sorted(
+            packages, key=lambda p: (-self.package_priority[p], p))
+
+    def package_run(self, package):
+        '''
+        Calls `package_do` for the `package` and records how long it took.
+        '''
+        start = time.time()
+        with self.package_phase(package, 'total'):
+            self.package_do(package)
+        self.package_times[package] = (start, time.time())
+
+    @contextmanager
+    def package_phase(self, package, phase):
+        '''
+        Times the enclosed `phase` of processing the `package` and records it
+        to the `CONAN_BOOST_TELEMETRY` event stream, if enabled.
+        '''
+        start = time.time()
+        event = {'ok': False}
+        try:
+            yield
+            event['ok'] = True
+        finally:
+            event.update({
+                'source': self.__class__.__name__, 'phase': phase,
+                'package': 'boost_' + package, 'version': self.args.version,
+                'start': start, 'duration': time.time() - start})
+            base_recipe.telemetry(event)
+
     def package_pre(self, package):
         '''
         Called before all packages are procesed for one `package`. Default
@@ -170,3 +379,43 @@ class ForEach(Main):
         does nothing.
         '''
         pass
+
+    def prefetch_start(self):
+        '''
+        Starts downloading the sources of all the packages into the shared
+        source cache in the background, with `prefetch_all.py`. So that the
+        packages don't wait for downloads when they get built.
+        '''
+        self.prefetch = subprocess.Popen([
+            sys.executable, os.path.join(script_dir, 'prefetch_all.py'),
+            '++version=%s' % (self.args.version),
+            '++recipes-dir=%s' % (self.args.recipes_dir)])
+
+    def prefetch_wait(self):
+        '''
+        Waits for the background `prefetch_start` downloads to finish.
+        '''
+        if getattr(self, 'prefetch', None):
+            if self.prefetch.wait() != 0:
+                print(">>>> Prefetching the sources failed.")
+            self.prefetch = None
+
+    def prefetch_stop(self):
+        '''
+        Stops the background `prefetch_start` downloads, if still running.
+        '''
+        if getattr(self, 'prefetch', None):
+            self.prefetch.terminate()
+            self.prefetch.wait()
+            self.prefetch = None
+
+    def package_check_call(self, command, cwd):
+        '''
+        Runs the `command` in the `cwd` directory. Unlike using `PushDir` this
+        doesn't change the process current directory. Hence it can be used
+        from concurrent `package_do` calls.
+        '''
+        if self.args.trace:
+            print('EXEC: "%s" in "%s"' % ('" "'.join(command), cwd))
+            sys.stdout.flush()
+        subprocess.check_call(command, cwd=cwd)
@@ -5,10 +5,13 @@
     Boost Software License, Version 1.0. (See accompanying file
     LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
 """
+import itertools
 import os.path
+import string
 from bls.git_tool import Git
 from bls.util import Main, PushDir
 from bls.lib_data import LibraryData
+from package_index import PackageIndex, strongly_connected_components
 
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -36,6 +39,13 @@ class PackageGen(Main):
         parser.add_argument('++bin-dir', default=default_bin_dir)
         parser.add_argument('++local', action='store_true')
         parser.add_argument('++build-data', action='store_true')
+        parser.add_argument(
+            '++cycle-edges',
+            help='The dependencies to find the cycle groups with. "build" for'+
+                ' the ones that matter for building and linking, or "header"'+
+                ' for all of them. Default is "build".',
+            choices=['build', 'header'],
+            default='build')
 
     def __run__(self):
         bin_dir = None
@@ -87,7 +97,10 @@ class PackageGen(Main):
                     data_dir, '%s-ranks-headers.json' % (label))
                 ranks_build_file = os.path.join(
                     data_dir, '%s-ranks-build.json' % (label))
-                if rebuild or not os.path.exists(deps_file):
+                headers_file = os.path.join(
+                    data_dir, '%s-headers.json' % (label))
+                if rebuild or not os.path.exists(deps_file) \
+                        or not os.path.exists(headers_file):
                     self.__check_call__([
                         git_switch_py,
                         '++root=%s' % (boost_root_dir),
@@ -110,6 +123,10 @@ class PackageGen(Main):
                         '++lib-info=%s' % (deps_file),
                         '++json=%s' % (ranks_build_file), '++buildable'
                     ])
+                    self.__save_data__(
+                        headers_file,
+                        self.__generate_headers_data__(
+                            boost_root_dir, deps_file))
 
             label = None
             if self.args.version == 'develop':
@@ -126,13 +143,17 @@ class PackageGen(Main):
                 os.path.join(
                     self.args.out_dir, 'package-data-%s.json' % (label)),
                 self.__generate_package_data__(label, data_dir))
+            self.__save_data__(
+                os.path.join(
+                    self.args.out_dir, 'package-headers-%s.json' % (label)),
+                self.__load_data__(os.path.join(
+                    data_dir, '%s-headers.json' % (label))))
 
     def __generate_package_data__(self, label, data_dir):
         if not label:
             return
 
         print('[GEN PACKAGE DATA %s]' % (label))
-        package_data = {}
 
         # Read in the deps, ranks build, and ranks headers data.
         deps_file = os.path.join(data_dir, '%s-deps.json' % (label))
@@ -149,61 +170,89 @@ class PackageGen(Main):
         ranks_headers_data = LibraryData(self.args)
         ranks_headers_data.load_dependency_info(ranks_headers_file)
 
+        # The build ranks have the cycles over all the header dependencies.
+        header_cycles = [
+            rank_info['libs'] for rank_info in ranks_build_data.ranks_info
+            if rank_info['is_cycle']]
+        return self.__make_package_data__(deps_data, header_cycles)
+
+    def __make_package_data__(self, deps_data, header_cycles):
+        '''
+        Makes the package data from the dependencies of the libraries, and the
+        cycles of their header dependencies.
+        '''
+        package_data = {}
+
         # First we create the synthetic cycle group packages.
-        cycle_groups = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j']
-        # We go through each build rank as that gives us the dependencies we
-        # need for building.
-        for rank_info in ranks_build_data.ranks_info:
-            if rank_info['is_cycle']:
-                name = 'cycle_group_'+cycle_groups.pop(0)
-                # A cycle, being a collection of the libraries in that cycle,
-                # needs to accumulate all the different aspects of each of
-                # the components.
-                header_only_libs = set()
-                b2_requires = set()
-                source_only_deps = set()
-                for lib in rank_info['libs']:
-                    if not deps_data.dependency_info[lib]['buildable']:
-                        header_only_libs.add(lib)
+        cycle_groups = self.__cycle_group_names__()
+        units = [{'libs': cycle, 'bundled': []} for cycle in header_cycles]
+        if self.args.cycle_edges == 'build':
+            units = self.__build_units__(deps_data, header_cycles)
+        self.__report_cycles__(deps_data, header_cycles, units)
+        for unit in units:
+            cycle = unit['libs']
+            if len(cycle) == 1:
+                # A built library that is only in a cycle through the header
+                # only libraries it bundles.
+                lib = cycle[0]
+                b2_requires, source_only_deps = self.__lib_requires__(
+                    deps_data, lib)
+                for bundled in unit['bundled']:
                     b2_requires.update(set(
-                        deps_data.dependency_info[lib]['header_deps']))
-                    source_only_deps.update(set(
-                        deps_data.dependency_info[lib]['source_deps']))
-                    package_data[self.__clean_name__(lib)] = \
-                        self.__make_lib_package_data__(
-                            name=lib,
-                            cycle_group=name,
-                            lib_short_names=[lib],
-                            b2_requires=[name],
-                            header_only_libs=[] if deps_data.dependency_info[
-                                lib]['buildable'] else [lib])
-                source_only_deps.difference_update(b2_requires)
-                b2_requires.difference_update(set(rank_info['libs']))
-                package_data[name] = self.__make_lib_package_data__(
-                    name=name,
-                    lib_short_names=rank_info['libs'],
-                    header_only_libs=header_only_libs,
-                    b2_requires=b2_requires,
-                    source_only_deps=source_only_deps)
+                        deps_data.dependency_info[bundled]['header_deps']))
+                b2_requires.difference_update(set(cycle + unit['bundled']))
+                source_only_deps.difference_update(
+                    b2_requires | set(unit['bundled']))
+                package_data[self.__clean_name__(lib)] = \
+                    self.__make_lib_package_data__(
+                        name=lib,
+                        lib_short_names=[lib],
+                        b2_requires=b2_requires,
+                        source_only_deps=source_only_deps,
+                        bundled_headers=unit['bundled'])
+                continue
+            name = 'cycle_group_'+next(cycle_groups)
+            # A cycle, being a collection of the libraries in that cycle,
+            # needs to accumulate all the different aspects of each of
+            # the components.
+            header_only_libs = set()
+            b2_requires = set()
+            source_only_deps = set()
+            for lib in cycle:
+                if not deps_data.dependency_info[lib]['buildable']:
+                    header_only_libs.add(lib)
+                b2_requires.update(set(
+                    deps_data.dependency_info[lib]['header_deps']))
+                source_only_deps.update(set(
+                    deps_data.dependency_info[lib]['source_deps']))
+                package_data[self.__clean_name__(lib)] = \
+                    self.__make_lib_package_data__(
+                        name=lib,
+                        cycle_group=name,
+                        lib_short_names=[lib],
+                        b2_requires=[name],
+                        header_only_libs=[] if deps_data.dependency_info[
+                            lib]['buildable'] else [lib])
+            for bundled in unit['bundled']:
+                b2_requires.update(set(
+                    deps_data.dependency_info[bundled]['header_deps']))
+            source_only_deps.difference_update(b2_requires)
+            source_only_deps.difference_update(set(cycle + unit['bundled']))
+            b2_requires.difference_update(set(cycle + unit['bundled']))
+            package_data[name] = self.__make_lib_package_data__(
+                name=name,
+                lib_short_names=cycle,
+                header_only_libs=header_only_libs,
+                b2_requires=b2_requires,
+                source_only_deps=source_only_deps,
+                bundled_headers=unit['bundled'])
         for boost_lib in deps_data.dependency_info.keys():
             if boost_lib not in package_data:
                 # We add libraries that are not in a cycle at this point as
                 # libraries in cycles where already filled in above.
                 lib_data = deps_data.dependency_info[boost_lib]
-                b2_requires = list(lib_data['header_deps'])
-                # Source dependencies are only needed during the build.
-                source_only_deps = []
-                for source_dep in lib_data['source_deps']:
-                    if deps_data.dependency_info[source_dep]['buildable']:
-                        # A source dependency that itself is buildable needs
-                        # to be a regular dependency so that we get the
-                        # transitive build information.
-                        b2_requires.append(source_dep)
-                    else:
-                        # For header only source dependencies we just need the
-                        # headers. As we will be sideloading those during the
-                        # build only.
-                        source_only_deps.append(source_dep)
+                b2_requires, source_only_deps = self.__lib_requires__(
+                    deps_data, boost_lib)
                 # To have conistent diffs for the gnerated data we sort the
                 # lists.
                 package_data[self.__clean_name__(boost_lib)] = \
@@ -216,15 +265,222 @@ class PackageGen(Main):
                         source_only_deps=source_only_deps
                 )
 
+        self.__reduce_requires__(package_data)
         return package_data
 
+    def __cycle_group_names__(self):
+        '''
+        Generates the suffixes of the cycle group names. I.e. "a" to "z", then
+        "aa", "ab", and so on.
+        '''
+        for length in itertools.count(1):
+            for letters in itertools.product(
+                    string.ascii_lowercase, repeat=length):
+                yield ''.join(letters)
+
+    def __lib_requires__(self, deps_data, lib):
+        '''
+        The requirements, and the source only dependencies, of a library
+        packaged by itself.
+        '''
+        lib_data = deps_data.dependency_info[lib]
+        b2_requires = set(lib_data['header_deps'])
+        # Source dependencies are only needed during the build.
+        source_only_deps = set()
+        for source_dep in lib_data['source_deps']:
+            if deps_data.dependency_info[source_dep]['buildable']:
+                # A source dependency that itself is buildable needs
+                # to be a regular dependency so that we get the
+                # transitive build information.
+                b2_requires.add(source_dep)
+            else:
+                # For header only source dependencies we just need the
+                # headers. As we will be sideloading those during the
+                # build only.
+                source_only_deps.add(source_dep)
+        return b2_requires, source_only_deps
+
+    def __build_units__(self, deps_data, header_cycles):
+        '''
+        Splits the cycles of the header dependencies into the packages that
+        need to be built together. Only the dependencies on the built
+        libraries make such a unit, as the others are only headers. Each unit
+        bundles the headers of the header only libraries of its cycle it
+        depends on, instead of requiring them, which keeps the packages
+        acyclic. And the header only libraries that are in a cycle by
+        themselves make a group that doesn't get built. Returns the units
+        that are a group, or bundle headers, as `libs` and `bundled` lists.
+        '''
+        info = deps_data.dependency_info
+
+        def deps(lib):
+            return set(info[lib]['header_deps']) | \
+                set(info[lib]['source_deps'])
+
+        units = []
+        for cycle in header_cycles:
+            members = set(cycle)
+            built = [lib for lib in cycle if info[lib]['buildable']]
+            headers = set(cycle) - set(built)
+            # The header only libraries each built library reaches through
+            # other header only libraries.
+            bundled = {}
+            for lib in built:
+                bundled[lib] = set()
+                todo = list(deps(lib) & headers)
+                while todo:
+                    dep = todo.pop()
+                    if dep not in bundled[lib]:
+                        bundled[lib].add(dep)
+                        todo.extend(deps(dep) & headers)
+            # The built libraries depend on each other directly, or through
+            # the headers they bundle.
+            build_graph = {}
+            for lib in built:
+                build_graph[lib] = set()
+                for user in [lib] + list(bundled[lib]):
+                    build_graph[lib] |= (deps(user) & members) - headers
+                build_graph[lib].discard(lib)
+            for component in strongly_connected_components(build_graph):
+                units.append({
+                    'libs': component,
+                    'bundled': sorted(set().union(
+                        *[bundled[lib] for lib in component]))})
+            header_graph = dict(
+                [(lib, deps(lib) & headers) for lib in headers])
+            for component in strongly_connected_components(header_graph):
+                units.append({'libs': component, 'bundled': []})
+        # Anything else is a regular package.
+        return [
+            unit for unit in units
+            if len(unit['libs']) > 1 or len(unit['bundled']) > 0]
+
+    def __report_cycles__(self, deps_data, header_cycles, units):
+        '''
+        Prints the cycle groups from the header dependencies, and the ones
+        used. With an estimate of the cost of changing each library. Which is
+        how many libraries get rebuilt, i.e. all the built ones in the
+        packages with its sources.
+        '''
+        info = deps_data.dependency_info
+
+        def rebuilt(units):
+            packages_of = {}
+            for unit in units:
+                for lib in unit['libs'] + unit['bundled']:
+                    packages_of.setdefault(lib, []).append(unit['libs'])
+            total = 0
+            for changed in info.keys():
+                for libs in packages_of.get(changed, [[changed]]):
+                    total += len([l for l in libs if info[l]['buildable']])
+            return total
+
+        reports = [('header', [
+            {'libs': cycle, 'bundled': []} for cycle in header_cycles])]
+        if self.args.cycle_edges != 'header':
+            reports.append((self.args.cycle_edges, units))
+        for label, units in reports:
+            groups = [unit for unit in units if len(unit['libs']) > 1]
+            print('[CYCLE GROUPS %s] %s groups, of %s libraries, %s'
+                  ' libraries rebuilt changing each library' % (
+                      label.upper(), len(groups),
+                      sum([len(unit['libs']) for unit in groups]),
+                      rebuilt(units)))
+            for unit in units:
+                print('  %s (%s built): %s%s' % (
+                    len(unit['libs']),
+                    len([l for l in unit['libs'] if info[l]['buildable']]),
+                    ' '.join(unit['libs']),
+                    ', bundles: ' + ' '.join(unit['bundled'])
+                    if unit['bundled'] else ''))
+
+    def __reduce_requires__(self, package_data):
+        '''
+        Reduces the `b2_requires` of each package to the ones not already
+        required by another of its requirements. Which is enough for Conan as
+        it propagates the transitive dependencies. The full set is kept as
+        `b2_requires_closure`.
+        '''
+        index = PackageIndex.from_data(package_data)
+        before = {'edges': 0, 'checks': 0}
+        after = {'edges': 0, 'checks': 0}
+        for package, info in package_data.items():
+            requires = index.requires(package, kinds=('b2',))
+            reduced = set(requires)
+            for dep in requires:
+                reduced -= index.closure(dep)
+            info['b2_requires_closure'] = sorted(index.closure(package))
+            info['b2_requires_reduced'] = sorted(reduced)
+        for package, info in package_data.items():
+            # Installing a package has Conan expand, and check for conflicts,
+            # every requirement of every package in its graph.
+            graph = [package] + info['b2_requires_closure']
+            before['edges'] += len(info['b2_requires'])
+            after['edges'] += len(info['b2_requires_reduced'])
+            before['checks'] += sum(
+                [len(package_data[p]['b2_requires']) for p in graph])
+            after['checks'] += sum(
+                [len(package_data[p]['b2_requires_reduced']) for p in graph])
+        for package, info in package_data.items():
+            info['b2_requires'] = info.pop('b2_requires_reduced')
+        print('[REDUCED REQUIRES] edges: %s => %s, requirement checks for'
+              ' installing every package: %s => %s' % (
+                  before['edges'], after['edges'],
+                  before['checks'], after['checks']))
+
+    def __generate_headers_data__(self, boost_root_dir, deps_file):
+        '''
+        Generates which headers belong to which library. This is needed to
+        split up the merged headers of the monolithic release archive. To keep
+        the data small we list a directory, with a trailing "/", instead of
+        the individual headers when all the headers in it belong to the same
+        library.
+        '''
+        print('[GEN HEADERS DATA]')
+        deps_data = LibraryData(self.args)
+        deps_data.load_dependency_info(deps_file)
+        # Collect the headers of each library, and which libraries have
+        # headers in each directory.
+        lib_headers = {}
+        dir_libs = {}
+        for lib in deps_data.dependency_info.keys():
+            include_dir = os.path.join(
+                boost_root_dir, 'libs', lib.replace('~', '/'), 'include')
+            lib_headers[lib] = []
+            for root, _, files in os.walk(include_dir):
+                for name in files:
+                    header = os.path.relpath(
+                        os.path.join(root, name), include_dir).replace(
+                            '\\', '/')
+                    lib_headers[lib].append(header)
+                    parts = header.split('/')
+                    for i in range(1, len(parts)):
+                        dir_libs.setdefault(
+                            '/'.join(parts[0:i]), set()).add(lib)
+        # Now reduce the headers to the top-most directories owned by only
+        # one library.
+        headers_data = {}
+        for lib, headers in lib_headers.items():
+            paths = set()
+            for header in headers:
+                path = header
+                parts = header.split('/')
+                for i in range(1, len(parts)):
+                    if dir_libs['/'.join(parts[0:i])] == set([lib]):
+                        path = '/'.join(parts[0:i]) + '/'
+                        break
+                paths.add(path)
+            headers_data[self.__clean_name__(lib)] = sorted(paths)
+        return headers_data
+
     def __make_lib_package_data__(
         self, name,
         cycle_group=None,
         lib_short_names=[],
         header_only_libs=[],
         b2_requires=[],
-        source_only_deps=[]
+        source_only_deps=[],
+        bundled_headers=[]
     ):
         return {
             'name': self.__clean_name__(name),
@@ -232,7 +488,9 @@ class PackageGen(Main):
             'lib_short_names': self.__clean_names__(lib_short_names),
             'header_only_libs': self.__clean_names__(header_only_libs),
             'b2_requires': self.__clean_names__(b2_requires),
-            'source_only_deps': self.__clean_names__(source_only_deps)}
+            'b2_requires_closure': [],
+            'source_only_deps': self.__clean_names__(source_only_deps),
+            'bundled_headers': self.__clean_names__(bundled_headers)}
 
     def __clean_name__(self, name):
         return name.replace('~', '_')
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import hashlib
+import json
+import os.path
+import sqlite3
+import tempfile
+import threading
+
+
+script_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(os.path.dirname(script_dir), 'data')
+
+
+class PackageIndex(object):
+    '''
+    Index of the dependency graph of the package data, compiled into an
+    SQLite database. The transitive requirements, dependents, and the DAG
+    level of each package are computed once, when the index is built, and
+    are single lookups afterwards.
+
+    There are two kinds of requirement edges. The "b2" ones, from the
+    `b2_requires`, are the Conan requirements. And the "source" ones, from
+    the `source_only_deps`, only matter for the order of building.
+    '''
+
+    schema = '''
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE packages (
+            name TEXT PRIMARY KEY, cycle_group TEXT, header_only INTEGER,
+            level INTEGER);
+        CREATE TABLE libs (package TEXT, lib TEXT, header_only INTEGER);
+        CREATE TABLE bundled (package TEXT, lib TEXT);
+        CREATE TABLE requires (package TEXT, dep TEXT, kind TEXT);
+        CREATE TABLE closure (package TEXT, dep TEXT);
+        CREATE INDEX packages_level ON packages (level);
+        CREATE INDEX packages_cycle_group ON packages (cycle_group);
+        CREATE INDEX libs_package ON libs (package);
+        CREATE INDEX bundled_package ON bundled (package);
+        CREATE INDEX requires_package ON requires (package);
+        CREATE INDEX requires_dep ON requires (dep);
+        CREATE INDEX closure_package ON closure (package);
+        CREATE INDEX closure_dep ON closure (dep);
+        '''
+
+    @classmethod
+    def data_file(cls, version):
+        '''
+        The package data file of a Boost `version`, i.e. "1.71.0", "develop",
+        or "master".
+        '''
+        label = version
+        if version not in ['develop', 'master']:
+            label = 'boost-%s' % (version)
+        return os.path.join(data_dir, 'package-data-%s.json' % (label))
+
+    @classmethod
+    def open(cls, data_file):
+        '''
+        The index of the `data_file`. The index is kept next to it, with an
+        ".sqlite" extension, and is rebuilt when the data changes.
+        '''
+        with open(data_file, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+        index_file = os.path.splitext(data_file)[0] + '.sqlite'
+        if os.path.isfile(index_file):
+            index = cls(sqlite3.connect(
+                index_file, check_same_thread=False))
+            if index.__meta__('data_sha1') == digest:
+                return index
+            index.db.close()
+        # Built aside and moved into place. So that concurrent scripts never
+        # see a partial index.
+        fd, tmp = tempfile.mkstemp(
+            suffix='.sqlite', dir=os.path.dirname(index_file))
+        os.close(fd)
+        try:
+            db = sqlite3.connect(tmp)
+            cls.build(db, json.loads(content.decode('utf-8')), digest)
+            db.close()
+            os.replace(tmp, index_file)
+        except Exception:
+            os.remove(tmp)
+            raise
+        return cls(sqlite3.connect(index_file, check_same_thread=False))
+
+    @classmethod
+    def from_data(cls, package_data):
+        '''
+        An in memory index of the `package_data`.
+        '''
+        db = sqlite3.connect(':memory:', check_same_thread=False)
+        cls.build(db, package_data)
+        return cls(db)
+
+    @classmethod
+    def build(cls, db, package_data, digest=None):
+        '''
+        Fills the empty `db` with the index of the `package_data`. Fails
+        when the requirements have a cycle, as the packages can't be built
+        in any order then.
+        '''
+        requires = {}
+        for package, info in package_data.items():
+            requires[package] = set(
+                [('b2', dep) for dep in info['b2_requires']] +
+                [('source', dep) for dep in info['source_only_deps']
+                    if dep in package_data])
+        cycles = [
+            component for component in strongly_connected_components(
+                dict([
+                    (package, [dep for _, dep in deps])
+                    for package, deps in requires.items()]))
+            if len(component) > 1 or
+            component[0] in [dep for _, dep in requires[component[0]]]]
+        if cycles:
+            raise Exception(
+                "The package requirements have cycles: %s" % ("; ".join([
+                    " ".join(component) for component in cycles])))
+        closures = {}
+
+        def closure(package):
+            if package not in closures:
+                result = set()
+                for kind, dep in requires[package]:
+                    if kind == 'b2':
+                        result.add(dep)
+                        result |= closure(dep)
+                closures[package] = result
+            return closures[package]
+
+        levels = {}
+
+        def level(package):
+            if package not in levels:
+                levels[package] = 1 + max(
+                    [-1] + [level(dep) for _, dep in requires[package]])
+            return levels[package]
+
+        db.executescript(cls.schema)
+        db.execute(
+            'INSERT INTO meta VALUES (?, ?)', ('data_sha1', digest or ''))
+        for package, info in package_data.items():
+            header_only = set(info['header_only_libs'])
+            db.execute('INSERT INTO packages VALUES (?, ?, ?, ?)', (
+                package, info['cycle_group'],
+                set(info['lib_short_names']) <= header_only, level(package)))
+            db.executemany('INSERT INTO libs VALUES (?, ?, ?)', [
+                (package, lib, lib in header_only)
+                for lib in info['lib_short_names']])
+            db.executemany('INSERT INTO bundled VALUES (?, ?)', [
+                (package, lib) for lib in info['bundled_headers']])
+            db.executemany('INSERT INTO requires VALUES (?, ?, ?)', [
+                (package, dep, kind) for kind, dep in requires[package]])
+            db.executemany('INSERT INTO closure VALUES (?, ?)', [
+                (package, dep) for dep in closure(package)])
+        db.commit()
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+
+    def __query__(self, sql, *args):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def __meta__(self, key):
+        try:
+            rows = self.__query__('SELECT value FROM meta WHERE key = ?', key)
+        except sqlite3.DatabaseError:
+            return None
+        return rows[0][0] if rows else None
+
+    def packages(self):
+        '''
+        All the packages, sorted.
+        '''
+        return [r[0] for r in self.__query__(
+            'SELECT name FROM packages ORDER BY name')]
+
+    def requires(self, package, kinds=('b2', 'source')):
+        '''
+        The packages the `package` directly requires.
+        '''
+        return set([r[0] for r in self.__query__(
+            'SELECT dep FROM requires WHERE package = ? AND kind IN (%s)' % (
+                ','.join('?' * len(kinds))), package, *kinds)])
+
+    def dependents(self, package, kinds=('b2', 'source')):
+        '''
+        The packages that directly require the `package`.
+        '''
+        return set([r[0] for r in self.__query__(
+            'SELECT package FROM requires WHERE dep = ? AND kind IN (%s)' % (
+                ','.join('?' * len(kinds))), package, *kinds)])
+
+    def closure(self, package):
+        '''
+        The packages the `package` requires, directly or indirectly.
+        '''
+        return set([r[0] for r in self.__query__(
+            'SELECT dep FROM closure WHERE package = ?', package)])
+
+    def dependents_closure(self, package):
+        '''
+        The packages that require the `package`, directly or indirectly.
+        '''
+        return set([r[0] for r in self.__query__(
+            'SELECT package FROM closure WHERE dep = ?', package)])
+
+    def level(self, package):
+        '''
+        The DAG level of the `package`. Packages without requirements are at
+        level 0, and others one more than their highest requirement.
+        '''
+        return self.__query__(
+            'SELECT level FROM packages WHERE name = ?', package)[0][0]
+
+    def levels(self):
+        '''
+        The packages grouped by level, in level order. I.e. the order to
+        build them in, where all the packages of a group can be built at the
+        same time.
+        '''
+        groups = []
+        for name, level in self.__query__(
+                'SELECT name, level FROM packages ORDER BY level'):
+            if len(groups) <= level:
+                groups.append(set())
+            groups[level].add(name)
+        return groups
+
+    def libs(self, package):
+        '''
+        The libraries in the `package`, sorted.
+        '''
+        return [r[0] for r in self.__query__(
+            'SELECT lib FROM libs WHERE package = ? ORDER BY lib', package)]
+
+    def built_libs(self, package):
+        '''
+        The libraries in the `package` that are not header only, sorted.
+        '''
+        return [r[0] for r in self.__query__(
+            'SELECT lib FROM libs WHERE package = ? AND NOT header_only'
+            ' ORDER BY lib', package)]
+
+    def bundled_headers(self, package):
+        '''
+        The header only libraries the `package` has the headers of, sorted.
+        '''
+        return [r[0] for r in self.__query__(
+            'SELECT lib FROM bundled WHERE package = ? ORDER BY lib', package)]
+
+    def is_header_only(self, package):
+        '''
+        If all the libraries in the `package` are header only.
+        '''
+        return bool(self.__query__(
+            'SELECT header_only FROM packages WHERE name = ?', package)[0][0])
+
+    def cycle_group(self, package):
+        '''
+        The cycle group package the `package` is a member of, or `None`.
+        '''
+        return self.__query__(
+            'SELECT cycle_group FROM packages WHERE name = ?', package)[0][0]
+
+    def cycle_members(self, group):
+        '''
+        The member packages of the cycle `group` package, sorted.
+        '''
+        return [r[0] for r in self.__query__(
+            'SELECT name FROM packages WHERE cycle_group = ? ORDER BY name',
+            group)]
+
+
+def strongly_connected_components(graph):
+    '''
+    The strongly connected components of the `graph`, a dict of each node to
+    the nodes it has edges to. Each component is a sorted list, and they come
+    in reverse topological order, i.e. dependencies first.
+    '''
+    # Tarjan's algorithm, without recursion as the graphs can be deep.
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in sorted(graph.keys()):
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(sorted(graph.get(root, []))))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(graph.get(child, [])))))
+                    break
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+    return components
+
+
+if __name__ == "__main__":
+    # Only the command line needs bls. So that the index can be used, and
+    # tested, without it.
+    from bls.util import Main
+
+    class PackageIndexQuery(Main):
+        '''
+        Prints facts about the packages from the index of the package data.
+        '''
+
+        def __init_parser__(self, parser):
+            parser.add_argument(
+                '++version',
+                help='The version of Boost to query.',
+                required=True)
+            parser.add_argument(
+                'packages',
+                help='The packages to query. Default is all.',
+                nargs='*')
+
+        def __run__(self):
+            index = PackageIndex.open(
+                PackageIndex.data_file(self.args.version))
+            for package in self.args.packages or index.packages():
+                print('%s:' % (package))
+                print('  level: %s' % (index.level(package)))
+                print('  header only: %s' % (index.is_header_only(package)))
+                print('  cycle group: %s' % (index.cycle_group(package)))
+                print('  requires: %s' % (' '.join(
+                    sorted(index.requires(package)))))
+                print('  closure: %s' % (' '.join(
+                    sorted(index.closure(package)))))
+                print('  dependents: %s' % (' '.join(
+                    sorted(index.dependents_closure(package)))))
+
+    PackageIndexQuery()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import os.path
+import sys
+import threading
+import time
+import urllib.request
+from foreach import ForEach
+import base_recipe
+
+
+class PrefetchAll(ForEach):
+    '''
+    Downloads, and verifies, the sources of all the Boost packages into the
+    shared source cache of the recipes. Packages are fetched in the order
+    they get built. Hence this can run in the background of the building
+    with the ++prefetch option of `create_all.py` and `build_all.py`.
+    '''
+
+    package_do_concurrent = True
+    package_costs_recorded = False
+
+    def __init_parser__(self, parser):
+        super(PrefetchAll, self).__init_parser__(parser)
+        parser.set_defaults(jobs=8)
+        parser.add_argument(
+            '++retry',
+            help='How many times to retry a download. Default is 2.',
+            type=int,
+            default=int(os.getenv('CONAN_BOOST_SOURCE_RETRY', '2')))
+
+    def groups_pre(self, groups):
+        self.conanfile = base_recipe.load()
+        self.recipe = self.conanfile.BoostBaseConan
+        self.cache = self.conanfile.BoostSourceCache(
+            self.conanfile.boost_cache_dir('sources'),
+            int(os.getenv('CONAN_BOOST_SOURCE_CACHE_SIZE', '4096'))
+            * 1024 * 1024)
+        self.fetched = set()
+        self.fetched_lock = threading.Lock()
+        self.fetches = 0
+        self.start = time.time()
+        super(PrefetchAll, self).groups_pre(groups)
+
+    def package_do(self, package):
+        super(PrefetchAll, self).package_do(package)
+        if package == 'base':
+            return
+        # Cycle group members use the sources of the group.
+        if self.package_index.cycle_group(package):
+            return
+        fetches = self.recipe.boost_github_fetches(
+            self.args.version,
+            self.package_index.libs(package) + sorted(
+                self.package_index.requires(package, kinds=('source',))) +
+            self.package_index.bundled_headers(package),
+            not self.package_index.is_header_only(package))
+        for fetch in fetches:
+            self.__fetch__(fetch)
+
+    def groups_post(self, groups):
+        super(PrefetchAll, self).groups_post(groups)
+        print('>>>> PREFETCHED: %s files, downloaded %s bytes, in %.0fs' % (
+            self.fetches, self.cache.downloaded, time.time() - self.start))
+        sys.stdout.flush()
+
+    def __fetch__(self, fetch):
+        # Many packages need the same sources. Only fetch each one once.
+        with self.fetched_lock:
+            if fetch['key'] in self.fetched:
+                return
+            self.fetched.add(fetch['key'])
+        retry_wait = int(os.getenv('CONAN_BOOST_SOURCE_RETRY_WAIT', '5'))
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.cache.fetch(fetch['key'], fetch['url'], self.__download__)
+                break
+            except Exception as e:
+                if attempt > self.args.retry:
+                    raise
+                print('>>>> Retrying fetch of %s, after error: %s' % (
+                    fetch['url'], e))
+                time.sleep(retry_wait)
+        with self.fetched_lock:
+            self.fetches += 1
+            print('>>>> Fetched: %s' % (fetch['url']))
+            sys.stdout.flush()
+
+    def __download__(self, url, filename):
+        # The cache reads through the archives, to catch truncated or corrupt
+        # ones, before they get into it.
+        urllib.request.urlretrieve(url, filename)
+
+
+if __name__ == "__main__":
+    PrefetchAll()
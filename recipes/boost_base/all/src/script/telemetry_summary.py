@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+"""
+import json
+import os
+from bls.util import Main
+
+
+class TelemetrySummary(Main):
+    '''
+    Summarizes the `CONAN_BOOST_TELEMETRY` event stream written by the
+    scripts and the recipes. Ranks the slowest packages and phases across
+    all the recorded runs, or only the ones given.
+    '''
+
+    def __init_parser__(self, parser):
+        parser.add_argument(
+            '++telemetry',
+            help='The telemetry file to summarize. Default is the'+
+                ' "CONAN_BOOST_TELEMETRY" environment variable.',
+            default=os.getenv('CONAN_BOOST_TELEMETRY'))
+        parser.add_argument(
+            '++run',
+            help='Only summarize the given runs.',
+            action='append',
+            default=[])
+        parser.add_argument(
+            '++top',
+            help='How many of the slowest to list. Default is 20.',
+            type=int,
+            default=20)
+
+    def __run__(self):
+        events = []
+        with open(self.args.telemetry) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    events.append(json.loads(line))
+        runs = sorted(set([e.get('run') or '' for e in events]))
+        if self.args.run:
+            runs = [r for r in runs if r in self.args.run]
+            events = [e for e in events if e.get('run') in runs]
+        print('Runs: %s' % (len(runs)))
+        for run in runs:
+            run_events = [e for e in events if (e.get('run') or '') == run]
+            start = min([e['start'] for e in run_events])
+            end = max([e['start'] + e['duration'] for e in run_events])
+            failed = len([e for e in run_events if not e['ok']])
+            print('  %s: %s, %s events, %s failed' % (
+                run or '<none>', self.__time__(end - start),
+                len(run_events), failed))
+
+        # The whole time taken by the packages, as seen by the scripts.
+        self.__rank__(
+            'Slowest packages',
+            [e for e in events if e['phase'] == 'total'],
+            lambda e: e['package'])
+        # The time for each phase, as seen by the scripts and the recipes.
+        self.__rank__(
+            'Slowest phases',
+            [e for e in events if e['phase'] != 'total'],
+            lambda e: '%s %s' % (e['source'], e['phase']))
+        # The individual package phases.
+        self.__rank__(
+            'Slowest package phases',
+            [e for e in events if e['phase'] != 'total'],
+            lambda e: '%s %s' % (e['package'], e['phase']))
+
+        downloads = [
+            e for e in events if e['phase'] == 'download' and e['ok']]
+        print('Downloaded: %s files, %s bytes, in %s' % (
+            len(downloads), sum([e['bytes'] for e in downloads]),
+            self.__time__(sum([e['duration'] for e in downloads]))))
+        artifacts = {}
+        for e in events:
+            if e['phase'] == 'package' and 'artifacts' in e:
+                for name, size in e['artifacts'].items():
+                    artifacts[name] = max(size, artifacts.get(name, 0))
+        print('Largest artifacts:')
+        for name, size in sorted(
+                artifacts.items(), key=lambda a: -a[1])[0:self.args.top]:
+            print('  %12s %s' % (size, name))
+
+    def __rank__(self, title, events, key):
+        '''
+        Prints the top entries of the events grouped by `key`, ordered by
+        their total time.
+        '''
+        totals = {}
+        for e in events:
+            total = totals.setdefault(key(e), [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += e['duration']
+            total[2] = max(total[2], e['duration'])
+        print('%s:' % (title))
+        print('  %10s %10s %10s %6s' % ('total', 'mean', 'max', 'count'))
+        for name, (count, duration, longest) in sorted(
+                totals.items(), key=lambda t: -t[1][1])[0:self.args.top]:
+            print('  %10s %10s %10s %6s %s' % (
+                self.__time__(duration), self.__time__(duration / count),
+                self.__time__(longest), count, name))
+
+    def __time__(self, seconds):
+        if seconds >= 60:
+            return '%dm%02ds' % (seconds // 60, seconds % 60)
+        return '%.1fs' % (seconds)
+
+
+if __name__ == "__main__":
+    TelemetrySummary()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the preprocessor definitions the packages build with. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import io
+import os
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+from conans.client.conf import get_default_settings_yml  # noqa: E402
+from conans.client.output import ConanOutput  # noqa: E402
+from conans.model.env_info import EnvValues  # noqa: E402
+from conans.model.settings import Settings  # noqa: E402
+
+
+class TestBuildDefines(unittest.TestCase):
+
+    version = '1.71.0'
+
+    def conanfile(self, name, **options):
+        recipe = base_recipe.load()
+        conanfile_class = type('BoostXConan', (recipe.BoostBaseConan,), {
+            'name': name, 'version': self.version})
+        conanfile = conanfile_class(
+            ConanOutput(io.StringIO()), None, display_name=name)
+        conanfile.initialize(
+            Settings.loads(get_default_settings_yml()), EnvValues())
+        for option, value in options.items():
+            setattr(conanfile.options, option, value)
+        return conanfile
+
+    def test_mixin_defines(self):
+        # The definitions of the mixins get to the B2 command, which keys
+        # the incremental builds.
+        conanfile = self.conanfile('boost_program_options')
+        self.assertEqual(
+            conanfile.boost_build_defines,
+            ['BOOST_PROGRAM_OPTIONS_DYN_LINK=1'])
+        conanfile = self.conanfile('boost_iostreams', use_lzma=True)
+        self.assertEqual(
+            conanfile.boost_build_defines, ['LZMA_API_STATIC'])
+        conanfile = self.conanfile('boost_iostreams', use_lzma=False)
+        self.assertEqual(conanfile.boost_build_defines, [])
+
+    def test_no_defines(self):
+        self.assertEqual(
+            self.conanfile('boost_system').boost_build_defines, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
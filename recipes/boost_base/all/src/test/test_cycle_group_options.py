@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the options of the cycle groups, and of their member packages. Run
+with:
+
+    python3 -m unittest discover -s src/test
+"""
+import io
+import os
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+from conans.client.conf import get_default_settings_yml  # noqa: E402
+from conans.client.output import ConanOutput  # noqa: E402
+from conans.model.env_info import EnvValues  # noqa: E402
+from conans.model.info import ConanInfo  # noqa: E402
+from conans.model.settings import Settings  # noqa: E402
+
+
+class TestCycleGroupOptions(unittest.TestCase):
+
+    version = '1.71.0'
+
+    def conanfile(self, name, **options):
+        recipe = base_recipe.load()
+        conanfile_class = type('BoostXConan', (recipe.BoostBaseConan,), {
+            'name': name, 'version': self.version})
+        conanfile = conanfile_class(
+            ConanOutput(io.StringIO()), None, display_name=name)
+        conanfile.initialize(
+            Settings.loads(get_default_settings_yml()), EnvValues())
+        for option, value in options.items():
+            setattr(conanfile.options, option, value)
+        return conanfile
+
+    def group(self, **options):
+        '''
+        The build members, and package ID, of cycle_group_b with the given
+        options.
+        '''
+        conanfile = self.conanfile('boost_cycle_group_b', **options)
+        conanfile.info = ConanInfo.create(
+            conanfile.settings.values, conanfile.options.values, [], [],
+            'semver_direct_mode', None, None)
+        conanfile.package_id()
+        return sorted(conanfile.boost_build_members), \
+            conanfile.info.package_id()
+
+    def test_configure(self):
+        # The changed options of a member, and the ask to build it, go to
+        # the group package.
+        conanfile = self.conanfile('boost_locale', shared=True)
+        conanfile.configure()
+        self.assertEqual(
+            sorted(conanfile.options.values.as_list()), [
+                ('boost_cycle_group_b:build_locale', 'True'),
+                ('boost_cycle_group_b:shared', 'True'),
+                ('shared', 'True'),
+                ('use_icu', 'False')])
+
+    def test_configure_members(self):
+        # A member left at the defaults doesn't change the options another
+        # member gives to the group.
+        options = {}
+        for name, member_options in [
+                ('boost_thread', {'shared': True}),
+                ('boost_date_time', {})]:
+            conanfile = self.conanfile(name, **member_options)
+            conanfile.configure()
+            for option, value in conanfile.options.values.as_list():
+                if option.startswith('boost_cycle_group_b:'):
+                    self.assertEqual(options.get(option, value), value)
+                    options[option] = value
+        self.assertEqual(options, {
+            'boost_cycle_group_b:build_date_time': 'True',
+            'boost_cycle_group_b:build_thread': 'True',
+            'boost_cycle_group_b:shared': 'True'})
+
+    def test_package_id(self):
+        members, package_id = self.group()
+        built = self.conanfile('boost_cycle_group_b').boost_libs_to_build
+        self.assertEqual(members, sorted(built))
+        # All the members, however they are asked for.
+        self.assertEqual(self.group(build_members=','.join(built)), (
+            members, package_id))
+        self.assertEqual(self.group(build_members='needed', **dict([
+            ('build_' + lib, True) for lib in built])), (
+            members, package_id))
+        # Some of the members, however they are asked for.
+        some = (['date_time', 'thread'], self.group(
+            build_members='date_time,thread')[1])
+        self.assertNotEqual(some[1], package_id)
+        self.assertEqual(self.group(
+            build_members='needed', build_date_time=True,
+            build_thread=True), some)
+        self.assertEqual(self.group(
+            build_members='thread', build_date_time=True), some)
+
+    def test_unknown_member(self):
+        with self.assertRaises(Exception):
+            self.group(build_members='filesystem')
+
+
+if __name__ == '__main__':
+    unittest.main()
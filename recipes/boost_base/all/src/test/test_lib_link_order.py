@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the link order of the libraries in the lib dirs of the Boost
+packages. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import io
+import os
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+from conans.client.output import ConanOutput  # noqa: E402
+
+
+class TestLibLinkOrder(unittest.TestCase):
+
+    def link_order(self, lib, libs):
+        recipe = base_recipe.load()
+        conanfile_class = type('BoostXConan', (recipe.BoostBaseConan,), {
+            'name': 'boost_' + lib, 'version': '1.71.0'})
+        conanfile = conanfile_class(
+            ConanOutput(io.StringIO()), None, display_name='boost_' + lib)
+        conanfile.boost_mixins = []
+        return conanfile._lib_link_order(
+            os.path.join('build', lib, 'lib'), libs)
+
+    def test_dependencies(self):
+        # The libraries of the lib dir go first, and the dependencies after
+        # the ones requiring them.
+        self.assertEqual(
+            self.link_order('locale', [
+                'boost_chrono', 'boost_locale', 'boost_system',
+                'boost_thread']),
+            ['boost_locale', 'boost_thread', 'boost_chrono', 'boost_system'])
+
+    def test_stable(self):
+        # Libraries that don't require each other go in name order, whatever
+        # the order they are found in.
+        libs = [
+            'boost_atomic', 'boost_chrono', 'boost_date_time',
+            'boost_filesystem', 'boost_log', 'boost_regex', 'boost_system',
+            'boost_thread']
+        order = self.link_order('log', libs)
+        self.assertEqual(self.link_order('log', list(reversed(libs))), order)
+        self.assertEqual(order[0], 'boost_log')
+        self.assertEqual(order[-1], 'boost_system')
+        self.assertLess(
+            order.index('boost_date_time'), order.index('boost_thread'))
+
+    def test_variants(self):
+        self.assertEqual(
+            self.link_order('log', [
+                'boost_atomic', 'boost_log', 'boost_log_setup',
+                'boost_system']),
+            ['boost_log_setup', 'boost_log', 'boost_atomic', 'boost_system'])
+        self.assertEqual(
+            self.link_order('serialization', [
+                'boost_serialization', 'boost_wserialization']),
+            ['boost_wserialization', 'boost_serialization'])
+
+
+if __name__ == '__main__':
+    unittest.main()
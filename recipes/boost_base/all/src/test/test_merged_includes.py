@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the merged include dir of the Boost packages. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+
+
+class TestMergedIncludes(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['CONAN_BOOST_CACHE_DIR'] = os.path.join(self.dir, 'cache')
+        self.recipe = base_recipe.load()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def package(self, lib, manifest='1'):
+        '''
+        Makes a package, like in the Conan cache, with the headers of the
+        `lib`. Returns its include dir.
+        '''
+        package_dir = os.path.join(self.dir, 'data', 'boost_' + lib)
+        include_dir = os.path.join(package_dir, lib, 'include')
+        for path in ['boost/%s.hpp' % (lib), 'boost/%s/detail.hpp' % (lib)]:
+            path = os.path.join(include_dir, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('// ' + lib)
+        with open(os.path.join(package_dir, 'conanmanifest.txt'), 'w') as f:
+            f.write(manifest)
+        return include_dir
+
+    def test_merge(self):
+        include_dirs = [self.package('a'), self.package('b')]
+        merged_dir = self.recipe.boost_merged_include_dir(include_dirs)
+        for lib in ['a', 'b']:
+            self.assertTrue(os.path.isfile(os.path.join(
+                merged_dir, 'boost', lib + '.hpp')))
+            self.assertTrue(os.path.isfile(os.path.join(
+                merged_dir, 'boost', lib, 'detail.hpp')))
+        self.assertEqual(
+            self.recipe.boost_merged_include_dir(include_dirs), merged_dir)
+
+    def test_rebuilt_package(self):
+        # A package made again gets a new tree.
+        include_dirs = [self.package('a'), self.package('b')]
+        merged_dir = self.recipe.boost_merged_include_dir(include_dirs)
+        self.package('b', manifest='2')
+        self.assertNotEqual(
+            self.recipe.boost_merged_include_dir(include_dirs), merged_dir)
+
+    def test_removed_header(self):
+        # Dirs not in a package are keyed by their own modification time,
+        # which doesn't change when a header deeper down is removed. The tree
+        # with the broken link is made again.
+        include_dirs = [self.package('a'), self.package('b')]
+        os.remove(os.path.join(
+            self.dir, 'data', 'boost_a', 'conanmanifest.txt'))
+        merged_dir = self.recipe.boost_merged_include_dir(include_dirs)
+        os.remove(os.path.join(include_dirs[0], 'boost', 'a.hpp'))
+        self.assertTrue(self.recipe.boost_broken_links(merged_dir))
+        self.assertEqual(
+            self.recipe.boost_merged_include_dir(include_dirs), merged_dir)
+        self.assertFalse(self.recipe.boost_broken_links(merged_dir))
+        self.assertTrue(os.path.isfile(os.path.join(
+            merged_dir, 'boost', 'b.hpp')))
+
+
+if __name__ == '__main__':
+    unittest.main()
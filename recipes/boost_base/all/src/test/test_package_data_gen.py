@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the splitting of the header dependency cycles into the packages of
+the generated package data. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import argparse
+import contextlib
+import io
+import os
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+from package_index import PackageIndex, \
+    strongly_connected_components  # noqa: E402
+try:
+    # The generator is a bls script.
+    from package_data_gen import PackageGen
+except ImportError:
+    PackageGen = None
+
+
+class DepsData(object):
+    '''
+    The `dependency_info` of the libraries, like `bls.lib_data.LibraryData`,
+    from the header dependencies of each, and the ones that are built.
+    '''
+
+    def __init__(self, header_deps, built):
+        self.dependency_info = dict([(lib, {
+            'header_deps': deps, 'source_deps': [], 'buildable': lib in built
+        }) for lib, deps in header_deps.items()])
+
+
+@unittest.skipIf(PackageGen is None, 'needs the bls package')
+class TestPackageDataGen(unittest.TestCase):
+
+    # Like cycle_group_b, where the built libraries depend on each other
+    # through the header only ones. And lexical_cast and multiprecision
+    # are in a cycle by themselves. Outside of the cycle are config, and the
+    # built system, and iostreams with format which are only in a cycle
+    # because of the header only format.
+    header_deps = {
+        'config': [],
+        'system': ['config'],
+        'date_time': ['lexical_cast', 'serialization'],
+        'dynamic_bitset': ['lexical_cast', 'serialization'],
+        'lexical_cast': ['config', 'math', 'multiprecision'],
+        'math': ['lexical_cast', 'multiprecision'],
+        'multiprecision': ['lexical_cast', 'math', 'random'],
+        'random': ['dynamic_bitset', 'math'],
+        'serialization': ['config', 'spirit'],
+        'spirit': ['thread'],
+        'thread': ['date_time', 'lexical_cast', 'system'],
+        'iostreams': ['format', 'system'],
+        'format': ['iostreams'],
+    }
+    built = set([
+        'date_time', 'iostreams', 'math', 'random', 'serialization', 'system',
+        'thread'])
+
+    def setUp(self):
+        self.gen = PackageGen.__new__(PackageGen)
+        self.gen.args = argparse.Namespace(cycle_edges='build')
+
+    def header_cycles(self, header_deps):
+        return [
+            component
+            for component in strongly_connected_components(header_deps)
+            if len(component) > 1]
+
+    def make_package_data(self, header_deps, built):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.gen.__make_package_data__(
+                DepsData(header_deps, built),
+                self.header_cycles(header_deps))
+
+    def test_build_units(self):
+        units = self.gen.__build_units__(
+            DepsData(self.header_deps, self.built),
+            self.header_cycles(self.header_deps))
+        self.assertEqual(sorted(units, key=lambda unit: unit['libs']), [
+            {'libs': ['date_time', 'math', 'random', 'serialization',
+                      'thread'],
+             'bundled': ['dynamic_bitset', 'lexical_cast', 'multiprecision',
+                         'spirit']},
+            {'libs': ['iostreams'], 'bundled': ['format']},
+            {'libs': ['lexical_cast', 'multiprecision'], 'bundled': []}])
+
+    def test_package_data(self):
+        package_data = self.make_package_data(self.header_deps, self.built)
+        self.assertEqual(
+            package_data['cycle_group_a']['lib_short_names'],
+            ['date_time', 'math', 'random', 'serialization', 'thread'])
+        self.assertEqual(
+            package_data['cycle_group_a']['bundled_headers'],
+            ['dynamic_bitset', 'lexical_cast', 'multiprecision', 'spirit'])
+        self.assertEqual(
+            package_data['cycle_group_a']['b2_requires'], ['system'])
+        self.assertEqual(
+            package_data['cycle_group_b']['lib_short_names'],
+            ['lexical_cast', 'multiprecision'])
+        self.assertEqual(
+            package_data['cycle_group_b']['bundled_headers'], [])
+        self.assertEqual(package_data['iostreams']['cycle_group'], None)
+        self.assertEqual(
+            package_data['iostreams']['bundled_headers'], ['format'])
+        self.assertEqual(package_data['iostreams']['b2_requires'], ['system'])
+        self.assertEqual(
+            package_data['format']['b2_requires'], ['iostreams'])
+        # Acyclic, or the index would fail.
+        levels = PackageIndex.from_data(package_data).levels()
+        self.assertEqual(
+            sum([len(level) for level in levels]), len(package_data))
+
+    def test_many_cycle_groups(self):
+        # More cycle groups than letters.
+        header_deps = {}
+        for i in range(30):
+            header_deps['x%s' % (i)] = ['y%s' % (i)]
+            header_deps['y%s' % (i)] = ['x%s' % (i)]
+        package_data = self.make_package_data(header_deps, set())
+        groups = sorted([
+            name for name in package_data if name.startswith('cycle_group_')])
+        self.assertEqual(len(groups), 30)
+        self.assertIn('cycle_group_z', groups)
+        self.assertIn('cycle_group_ad', groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
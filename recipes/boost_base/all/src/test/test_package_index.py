@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the index of the package data dependency graph. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import os
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+from package_index import PackageIndex, \
+    strongly_connected_components  # noqa: E402
+
+
+class TestPackageIndex(unittest.TestCase):
+
+    def package_data(self, requires, source_only_deps={}):
+        '''
+        Package data with a header only library for each package, and the
+        given `b2_requires`, and `source_only_deps`, of each.
+        '''
+        return dict([(package, {
+            'name': package, 'cycle_group': None,
+            'lib_short_names': [package], 'header_only_libs': [package],
+            'b2_requires': deps, 'b2_requires_closure': [],
+            'source_only_deps': source_only_deps.get(package, []),
+            'bundled_headers': []}) for package, deps in requires.items()])
+
+    def test_levels(self):
+        index = PackageIndex.from_data(self.package_data({
+            'a': [], 'b': ['a'], 'c': ['a', 'b'], 'd': []}, {'d': ['c']}))
+        self.assertEqual(
+            index.levels(), [set(['a']), set(['b']), set(['c']), set(['d'])])
+        self.assertEqual(index.closure('c'), set(['a', 'b']))
+        # The source only deps order the building, but aren't requirements.
+        self.assertEqual(index.closure('d'), set())
+        self.assertEqual(index.dependents_closure('a'), set(['b', 'c']))
+
+    def test_cycle(self):
+        with self.assertRaises(Exception) as context:
+            PackageIndex.from_data(self.package_data({
+                'a': ['c'], 'b': ['a'], 'c': ['b'], 'd': ['a']}))
+        # Only the members of the cycle, not the packages that require it.
+        self.assertTrue(str(context.exception).endswith(': a b c'))
+
+    def test_source_only_cycle(self):
+        with self.assertRaises(Exception) as context:
+            PackageIndex.from_data(self.package_data(
+                {'a': [], 'b': ['a']}, {'a': ['b']}))
+        self.assertTrue(str(context.exception).endswith(': a b'))
+
+    def test_strongly_connected_components(self):
+        # Dependencies first, and the cycles as one component.
+        self.assertEqual(strongly_connected_components({
+            'a': ['b'], 'b': ['c', 'd'], 'c': ['b'], 'd': [], 'e': ['a']}),
+            [['d'], ['b', 'c'], ['a'], ['e']])
+
+
+if __name__ == '__main__':
+    unittest.main()
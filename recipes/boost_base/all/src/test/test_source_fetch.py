@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the fetching of the library sources against a local HTTP server
+serving fake GitHub archives. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import functools
+import http.server
+import io
+import os
+import os.path
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+from conans.client.output import ConanOutput  # noqa: E402
+
+
+class ArchiveServer(object):
+    '''
+    Serves the files in a directory. Requests can be made to fail with the
+    `fail(path, count)` predicate, given the path and how many times it has
+    been requested. Or to send only the first half of the file with the
+    `truncate(path, count)` predicate.
+    '''
+
+    def __init__(self, directory, fail=None, truncate=None):
+        self.hits = {}
+        server = self
+
+        class Handler(http.server.SimpleHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                if fail and fail(self.path, server.hits[self.path]):
+                    self.send_error(500)
+                    return
+                if truncate and truncate(self.path, server.hits[self.path]):
+                    with open(self.translate_path(self.path), 'rb') as f:
+                        content = f.read()
+                    content = content[0:len(content) // 2]
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+                return super(Handler, self).do_GET()
+
+        self.httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), functools.partial(Handler, directory=directory))
+        self.url = 'http://127.0.0.1:%s' % (self.httpd.server_port)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestSourceFetch(unittest.TestCase):
+
+    version = '1.71.0'
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['CONAN_BOOST_CACHE_DIR'] = os.path.join(self.dir, 'cache')
+        os.environ['CONAN_BOOST_SOURCE_RETRY'] = '2'
+        os.environ['CONAN_BOOST_SOURCE_RETRY_WAIT'] = '0'
+        self.cwd = os.getcwd()
+        self.source_dir = os.path.join(self.dir, 'source')
+        os.makedirs(self.source_dir)
+        os.chdir(self.source_dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def archive(self, repo, files, symlinks={}):
+        '''
+        Writes the GitHub archive of the `repo`, with the `files`, and
+        `symlinks` to their targets, to where the server serves it from.
+        Returns its contents.
+        '''
+        root = '%s-boost-%s' % (repo, self.version)
+        content = io.BytesIO()
+        with tarfile.open(fileobj=content, mode='w:gz') as tar:
+            for name, data in sorted(files.items()):
+                info = tarfile.TarInfo(root + '/' + name)
+                info.size = len(data)
+                info.mtime = 1500000000
+                tar.addfile(info, io.BytesIO(data))
+            for name, target in sorted(symlinks.items()):
+                info = tarfile.TarInfo(root + '/' + name)
+                info.type = tarfile.SYMTYPE
+                info.linkname = target
+                tar.addfile(info)
+        self.write_served(
+            '%s/archive/boost-%s.tar.gz' % (repo, self.version),
+            content.getvalue())
+        return content.getvalue()
+
+    def write_served(self, path, content):
+        filename = os.path.join(self.dir, 'served', path)
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'wb') as f:
+            f.write(content)
+
+    def lib_archive(self, repo, lib):
+        return self.archive(repo, {
+            'include/boost/%s.hpp' % (lib): b'// ' + lib.encode('utf-8'),
+            'test/test.cpp': b'int main() {}',
+            'LICENSE': b'license'})
+
+    def conanfile(self, server, libs, source_only_deps=[]):
+        recipe = base_recipe.load()
+        conanfile_class = type('BoostXConan', (recipe.BoostBaseConan,), {
+            'name': 'boost_x', 'version': self.version,
+            'website': server.url})
+        conanfile = conanfile_class(
+            ConanOutput(io.StringIO()), None, display_name='boost_x')
+        conanfile._boost_data_ = {'x': {
+            'name': 'x', 'cycle_group': None, 'lib_short_names': libs,
+            'header_only_libs': libs, 'b2_requires': [],
+            'b2_requires_closure': [], 'bundled_headers': [],
+            'source_only_deps': source_only_deps}}
+        conanfile.boost_mixins = []
+        return conanfile
+
+    def serve(self, fail=None, truncate=None):
+        server = ArchiveServer(
+            os.path.join(self.dir, 'served'), fail, truncate)
+        self.addCleanup(server.close)
+        return server
+
+    def assertHeaders(self, libs):
+        for lib in libs:
+            self.assertTrue(os.path.isfile(os.path.join(
+                self.source_dir, lib, 'include', 'boost', lib + '.hpp')))
+            self.assertFalse(os.path.exists(os.path.join(
+                self.source_dir, lib, 'test')))
+
+    def test_fetch_all(self):
+        libs = ['a', 'b', 'c']
+        for lib in libs + ['d']:
+            self.lib_archive(lib, lib)
+        server = self.serve()
+        self.conanfile(server, libs, ['d']).source()
+        self.assertHeaders(libs + ['d'])
+        self.assertEqual(len(server.hits), 4)
+
+    def test_source_repo(self):
+        # Libraries in a sub-directory of another repository.
+        self.lib_archive('interval', 'numeric_interval')
+        server = self.serve()
+        self.conanfile(server, ['numeric_interval']).source()
+        self.assertHeaders(['numeric_interval'])
+
+    def test_retry_failed_download(self):
+        libs = ['a', 'b']
+        for lib in libs:
+            self.lib_archive(lib, lib)
+        server = self.serve(
+            lambda path, count: path.startswith('/b/') and count == 1)
+        self.conanfile(server, libs).source()
+        self.assertHeaders(libs)
+        self.assertEqual(
+            server.hits['/b/archive/boost-%s.tar.gz' % (self.version)], 2)
+
+    def test_fail_after_retries(self):
+        self.lib_archive('a', 'a')
+        server = self.serve(lambda path, count: True)
+        with self.assertRaises(Exception):
+            self.conanfile(server, ['a']).source()
+        self.assertEqual(
+            server.hits['/a/archive/boost-%s.tar.gz' % (self.version)], 3)
+
+    def test_retry_truncated_download(self):
+        # The truncated archive never gets into the cache.
+        self.lib_archive('a', 'a')
+        server = self.serve(truncate=lambda path, count: count == 1)
+        self.conanfile(server, ['a']).source()
+        self.assertHeaders(['a'])
+        self.assertEqual(
+            server.hits['/a/archive/boost-%s.tar.gz' % (self.version)], 2)
+
+    def test_retry_bad_cached_archive(self):
+        # A bad archive already in the cache is removed and downloaded again.
+        content = self.lib_archive('a', 'a')
+        server = self.serve()
+        conanfile = self.conanfile(server, ['a'])
+        key = conanfile.boost_github_fetches(self.version, ['a'], False)[0][
+            'key']
+        bad = os.path.join(self.dir, 'bad.tar.gz')
+        with open(bad, 'wb') as f:
+            f.write(content[0:len(content) // 2])
+        blob = conanfile.boost_source_cache.add(bad)
+        index_file = os.path.join(
+            os.environ['CONAN_BOOST_CACHE_DIR'], 'sources', 'index', *key)
+        os.makedirs(os.path.dirname(index_file))
+        with open(index_file, 'w') as f:
+            f.write(os.path.basename(blob))
+        conanfile.source()
+        self.assertHeaders(['a'])
+        self.assertFalse(os.path.exists(blob))
+        self.assertEqual(
+            server.hits['/a/archive/boost-%s.tar.gz' % (self.version)], 1)
+
+    def test_changed_cached_archive(self):
+        # A cached archive that changed size after it was stored is removed
+        # and downloaded again. Without rehashing the unchanged ones.
+        self.lib_archive('a', 'a')
+        server = self.serve()
+        conanfile = self.conanfile(server, ['a'])
+        conanfile.source()
+        key = conanfile.boost_github_fetches(self.version, ['a'], False)[0][
+            'key']
+        index_file = os.path.join(
+            os.environ['CONAN_BOOST_CACHE_DIR'], 'sources', 'index', *key)
+        with open(index_file) as f:
+            digest, size = f.read().split()
+        blob = conanfile.boost_source_cache._blob_path(digest)
+        self.assertEqual(os.path.getsize(blob), int(size))
+        with open(blob, 'ab') as f:
+            f.write(b'x')
+        shutil.rmtree(os.path.join(self.source_dir, 'a'))
+        self.conanfile(server, ['a']).source()
+        self.assertHeaders(['a'])
+        self.assertEqual(os.path.getsize(blob), int(size))
+        self.assertEqual(
+            server.hits['/a/archive/boost-%s.tar.gz' % (self.version)], 2)
+
+    def test_concurrent_fetch(self):
+        # Threads fetching the same file share the one download.
+        recipe = base_recipe.load()
+        cache = recipe.BoostSourceCache(
+            os.path.join(os.environ['CONAN_BOOST_CACHE_DIR'], 'sources'))
+        downloads = []
+
+        def download(url, filename):
+            downloads.append(url)
+            time.sleep(0.1)
+            with open(filename, 'wb') as f:
+                f.write(b'a')
+
+        blobs = ThreadPool(4).map(lambda i: cache.fetch(
+            ('a', 'boost-1.71.0', 'a.txt'), 'url', download), range(4))
+        self.assertEqual(downloads, ['url'])
+        self.assertEqual(len(set(blobs)), 1)
+
+    def test_unsafe_paths(self):
+        # Members that would be extracted outside of the source folder.
+        for files, symlinks in [
+                ({'include/../../outside.hpp': b''}, {}),
+                ({}, {'include/boost/outside.hpp': '../../../../outside.hpp'}),
+                ({}, {'include/boost/outside.hpp': '/etc/passwd'})]:
+            files = dict(files)
+            files['include/boost/a.hpp'] = b'// a'
+            self.archive('a', files, symlinks)
+            # Not from the cache, as the archives differ.
+            os.environ['CONAN_BOOST_SOURCE_CACHE'] = '0'
+            server = self.serve()
+            with self.assertRaises(Exception):
+                self.conanfile(server, ['a']).source()
+            self.assertFalse(os.path.lexists(
+                os.path.join(self.dir, 'outside.hpp')))
+            self.assertFalse(os.path.lexists(os.path.join(
+                self.source_dir, 'a', 'include', 'boost', 'outside.hpp')))
+
+    def test_without_cache(self):
+        os.environ['CONAN_BOOST_SOURCE_CACHE'] = '0'
+        self.lib_archive('a', 'a')
+        server = self.serve()
+        self.conanfile(server, ['a']).source()
+        self.assertHeaders(['a'])
+        self.assertEqual(os.listdir(self.source_dir), ['a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
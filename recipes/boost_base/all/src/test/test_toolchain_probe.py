@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Copyright (C) 2020 Rene Rivera.
+Use, modification and distribution are subject to the
+Boost Software License, Version 1.0. (See accompanying file
+LICENSE_1_0.txt or copy at http://www.boost.org/LICENSE_1_0.txt)
+
+Tests the caching of the compiler probes of the B2 toolset. Run with:
+
+    python3 -m unittest discover -s src/test
+"""
+import io
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'script'))
+import base_recipe  # noqa: E402
+from conans.client.conf import get_default_settings_yml  # noqa: E402
+from conans.client.output import ConanOutput  # noqa: E402
+from conans.model.env_info import EnvValues  # noqa: E402
+from conans.model.settings import Settings  # noqa: E402
+
+
+class TestToolchainProbe(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['CONAN_BOOST_CACHE_DIR'] = os.path.join(self.dir, 'cache')
+        os.environ['PATH'] = os.path.join(self.dir, 'bin')
+        os.environ.pop('CXX', None)
+        self.compiler = os.path.join(self.dir, 'bin', 'g++-9')
+        os.makedirs(os.path.dirname(self.compiler))
+        self.write_compiler(1500000000)
+        self.probes = []
+        self.recipe = base_recipe.load()
+        self.recipe.BoostBaseConan._b2_toolchain_probes.clear()
+
+    def tearDown(self):
+        self.recipe.BoostBaseConan._b2_toolchain_probes.clear()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write_compiler(self, mtime):
+        with open(self.compiler, 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(self.compiler, 0o755)
+        os.utime(self.compiler, (mtime, mtime))
+
+    def toolset_exec(self):
+        '''
+        The `b2_toolset_exec` of a gcc 9 package, counting the probes in
+        `probes`.
+        '''
+        test = self
+        conanfile_class = type('BoostXConan', (self.recipe.BoostBaseConan,), {
+            'name': 'boost_system', 'version': '1.71.0'})
+
+        def probe(self):
+            test.probes.append(os.environ['PATH'])
+            return {
+                'toolset': 'gcc', 'toolset_version': '$(DEFAULT)',
+                'exec': test.compiler, 'version': None}
+        conanfile_class._b2_toolchain_probe = probe
+        conanfile = conanfile_class(
+            ConanOutput(io.StringIO()), None, display_name='boost_system')
+        conanfile.initialize(
+            Settings.loads(get_default_settings_yml()), EnvValues())
+        conanfile.settings.os = 'Linux'
+        conanfile.settings.compiler = 'gcc'
+        conanfile.settings.compiler.version = '9'
+        return conanfile.b2_toolset_exec
+
+    def test_cached(self):
+        self.assertEqual(self.toolset_exec(), self.compiler)
+        self.assertEqual(self.toolset_exec(), self.compiler)
+        self.assertEqual(len(self.probes), 1)
+        # From the disk cache in another process.
+        self.recipe.BoostBaseConan._b2_toolchain_probes.clear()
+        self.assertEqual(self.toolset_exec(), self.compiler)
+        self.assertEqual(len(self.probes), 1)
+
+    def test_changed_compiler(self):
+        # Probed again, in this process and from the disk cache, when the
+        # compiler binary changes.
+        self.toolset_exec()
+        self.write_compiler(1600000000)
+        self.toolset_exec()
+        self.assertEqual(len(self.probes), 2)
+        self.recipe.BoostBaseConan._b2_toolchain_probes.clear()
+        self.write_compiler(1700000000)
+        self.toolset_exec()
+        self.assertEqual(len(self.probes), 3)
+
+    def test_changed_path(self):
+        self.toolset_exec()
+        os.environ['PATH'] += os.pathsep + self.dir
+        self.toolset_exec()
+        self.assertEqual(len(self.probes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()